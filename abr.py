@@ -0,0 +1,228 @@
+"""
+Adaptive bitrate streaming for scheduler_client.py (--abr) and its QoE.
+
+With --abr the content is a video of --segments segments of
+SEGMENT_DURATION seconds each, every one available at the bitrates in
+BITRATES. Before each segment the sender's controller picks its bitrate, and
+the segment goes out as ceil(bitrate * duration / chunk size) chunks over
+both paths, like a DASH client fetching one segment at a time:
+
+  - the next segment starts once the previous one is ACKed, so each segment
+    yields a sample of the aggregate throughput of all paths;
+  - it waits while the estimated playout buffer holds more than BUFFER_MAX.
+
+Controllers:
+
+    buffer       BBA-0 (Huang et al., SIGCOMM 2014): lowest bitrate below
+                 RESERVOIR seconds of buffer, highest above RESERVOIR +
+                 CUSHION, linear in between
+    throughput   highest bitrate below THROUGHPUT_SAFETY x the harmonic mean
+                 of the last THROUGHPUT_WINDOW segments' aggregate throughput
+
+The sender only sees ACKs, so it runs PlayoutBuffer on segment ACK times to
+estimate the receiver's buffer. qoe.py runs the same model on the times the
+chunks actually reached the receiver, and scores each run with the linear
+QoE of Yin et al. (SIGCOMM 2015):
+
+    QoE = sum(bitrate) - REBUFFER_PENALTY * stall time
+          - SWITCH_PENALTY * sum(|bitrate change|) - STARTUP_PENALTY * startup delay
+
+with bitrates in Mbps, reported per segment.
+"""
+import math
+from collections import deque
+
+BITRATES = [300, 750, 1200, 1850, 2850, 4300]  # kbps, lowest first
+SEGMENT_DURATION = 1.0   # seconds of video per segment
+DEFAULT_SEGMENTS = 20
+
+STARTUP_BUFFER = 2.0     # seconds buffered before playback starts
+BUFFER_MAX = 10.0        # seconds; the sender waits rather than overfill the buffer
+
+RESERVOIR = 2.0          # buffer-based: seconds kept at the lowest bitrate
+CUSHION = 6.0            # buffer-based: seconds over which the bitrate ramps up
+THROUGHPUT_WINDOW = 5    # throughput-based: segments in the harmonic mean
+THROUGHPUT_SAFETY = 0.9  # throughput-based: fraction of the estimate to use
+
+REBUFFER_PENALTY = 4.3   # QoE per second stalled (also after startup)
+STARTUP_PENALTY = 4.3    # QoE per second of startup delay
+SWITCH_PENALTY = 1.0     # QoE per Mbps of bitrate change
+
+
+def highest_below(rate_kbps):
+    """Highest bitrate in BITRATES not above `rate_kbps` (the lowest if none is)."""
+    return max([b for b in BITRATES if b <= rate_kbps] or [BITRATES[0]])
+
+
+class BufferBased:
+    """BBA-0: the bitrate follows the buffer level alone."""
+
+    def choose(self, buffer_level, throughput):
+        if buffer_level <= RESERVOIR:
+            return BITRATES[0]
+        if buffer_level >= RESERVOIR + CUSHION:
+            return BITRATES[-1]
+        fraction = (buffer_level - RESERVOIR) / CUSHION
+        return highest_below(BITRATES[0] + fraction * (BITRATES[-1] - BITRATES[0]))
+
+
+class ThroughputBased:
+    """Rate-based: the bitrate follows the recent aggregate segment throughput."""
+
+    def choose(self, buffer_level, throughput):
+        return highest_below(THROUGHPUT_SAFETY * throughput * 8 / 1000)
+
+
+ABR_ALGORITHMS = {
+    "buffer": BufferBased,
+    "throughput": ThroughputBased,
+}
+
+
+class PlayoutBuffer:
+    """
+    Receiver playout model fed with segment arrival times, in order.
+
+    Playback starts once STARTUP_BUFFER seconds are buffered. When a segment
+    arrives after the buffer ran dry the player has stalled since then; it
+    resumes as soon as that segment is in.
+    """
+
+    def __init__(self, start):
+        self.start = start          # session start (first segment requested)
+        self.buffered = 0.0         # seconds buffered before playback started
+        self.play_start = None
+        self.runs_out = None        # when playback reaches the end of the buffer
+        self.rebuffers = 0
+        self.stall_time = 0.0
+        self.bitrates = []
+
+    def add(self, arrival, bitrate, duration=SEGMENT_DURATION):
+        self.bitrates.append(bitrate)
+        if self.play_start is None:
+            self.buffered += duration
+            if self.buffered >= STARTUP_BUFFER:
+                self.play_start = arrival
+                self.runs_out = arrival + self.buffered
+            return
+        if arrival > self.runs_out:
+            self.rebuffers += 1
+            self.stall_time += arrival - self.runs_out
+            self.runs_out = arrival
+        self.runs_out += duration
+
+    def level(self, now):
+        """Seconds of video buffered ahead of the playhead at `now`."""
+        if self.play_start is None:
+            return self.buffered
+        return max(0.0, self.runs_out - now)
+
+    def summary(self):
+        rates = [b / 1000 for b in self.bitrates]  # Mbps
+        changes = [abs(b - a) for a, b in zip(rates, rates[1:])]
+        # content too short to ever start: it starts with the last segment
+        startup = (self.play_start if self.play_start is not None else self.start) - self.start
+        qoe = (sum(rates) - REBUFFER_PENALTY * self.stall_time
+               - SWITCH_PENALTY * sum(changes) - STARTUP_PENALTY * startup)
+        return {
+            "segments": len(rates),
+            "startup_delay": startup,
+            "rebuffers": self.rebuffers,
+            "stall_time": self.stall_time,
+            "switches": sum(1 for c in changes if c),
+            "bitrate_mean": sum(self.bitrates) / len(self.bitrates) if self.bitrates else 0.0,
+            "qoe": qoe / len(rates) if rates else 0.0,
+        }
+
+
+class AbrSession:
+    """Sender side of an --abr run: segment plan, throughput samples, buffer estimate."""
+
+    def __init__(self, algorithm, segments, chunk_size):
+        self.algorithm = algorithm
+        self.controller = ABR_ALGORITHMS[algorithm]()
+        self.segments = segments
+        self.chunk_size = chunk_size
+        self.plan = []  # per segment: bitrate, first_seq, chunks, start, delivered
+        self.throughputs = deque(maxlen=THROUGHPUT_WINDOW)
+        self.buffer = None
+
+    @property
+    def remaining(self):
+        return len(self.plan) < self.segments
+
+    @property
+    def current(self):
+        """Index of the segment being sent."""
+        return len(self.plan) - 1
+
+    def throughput(self, paths):
+        """
+        Harmonic mean of recent segment throughputs (bytes/s), which span all
+        paths; before the first segment, the paths' summed delivery rates.
+        """
+        if self.throughputs:
+            return len(self.throughputs) / sum(1 / t for t in self.throughputs)
+        return sum(p.delivery_rate for p in paths if p.usable)
+
+    def ready(self, acked_seq, now):
+        """
+        Whether the next segment may start: the previous one is ACKed (every
+        chunk below `acked_seq` is) and the buffer has room for another.
+        """
+        if self.plan:
+            last = self.plan[-1]
+            if last["delivered"] is None:
+                if acked_seq < last["first_seq"] + last["chunks"]:
+                    return False
+                last["delivered"] = now
+                self.buffer.add(now, last["bitrate"])
+                size = last["chunks"] * self.chunk_size
+                self.throughputs.append(size / max(now - last["start"], 1e-6))
+        return self.buffer is None or self.buffer.level(now) + SEGMENT_DURATION <= BUFFER_MAX
+
+    def next_segment(self, seq, paths, now):
+        """Pick the next segment's bitrate; returns its number of chunks starting at `seq`."""
+        if self.buffer is None:
+            self.buffer = PlayoutBuffer(now)
+        bitrate = self.controller.choose(self.buffer.level(now), self.throughput(paths))
+        chunks = math.ceil(bitrate * 1000 / 8 * SEGMENT_DURATION / self.chunk_size)
+        self.plan.append({
+            "segment": len(self.plan),
+            "bitrate": bitrate,
+            "first_seq": seq,
+            "chunks": chunks,
+            "start": now,
+            "delivered": None,
+        })
+        return chunks
+
+
+def evaluate(plan, receive_log):
+    """
+    QoE summary of a run from its segment plan and the receiver's log
+    (server_log.json, or receive_log.json for downloads).
+
+    A segment arrives with its last chunk (the first copy of each); chunks
+    that never arrived (lost datagrams) are concealed, and a segment with no
+    chunk at all is skipped and counted as missing.
+    """
+    arrivals = {}
+    for entry in receive_log:
+        seq = entry["seq"]
+        if seq not in arrivals or entry["timestamp"] < arrivals[seq]:
+            arrivals[seq] = entry["timestamp"]
+
+    buffer = PlayoutBuffer(plan[0]["start"] if plan else 0.0)
+    missing = 0
+    available = 0.0  # segments are played in order
+    for segment in plan:
+        times = [arrivals[s] for s in range(segment["first_seq"], segment["first_seq"] + segment["chunks"])
+                 if s in arrivals]
+        if not times:
+            missing += 1
+            continue
+        available = max(available, max(times))
+        buffer.add(available, segment["bitrate"])
+
+    return {**buffer.summary(), "missing_segments": missing}
@@ -0,0 +1,15 @@
+"""
+Benchmark suite for the multipath QUIC client and server.
+
+Three layers, run from the repository root with `python -m benchmarks.run`:
+
+    micro       per-chunk scheduler decision cost and PathState property
+                access at realistic RTT history lengths (no network)
+    loopback    server.py + scheduler_client.py over 127.0.0.1: chunks/s
+                and CPU seconds per MB for each process
+    topologies  each scheduler over link_emulator.py replaying the topo*
+                traces: completion time, p95 latency, head-of-line wait
+
+Every result is {"value", "unit", "better"} keyed by name, so runs can be
+compared against benchmarks/baseline.json.
+"""
@@ -0,0 +1,144 @@
+"""Helpers shared by the benchmark layers: results, processes, certificates, logs."""
+import datetime
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PYTHON = sys.executable
+
+STARTUP_DELAY = 1.5   # seconds for the server (and emulator) to bind before the client starts
+CLIENT_TIMEOUT = 120  # seconds before a client run is abandoned
+# in a script's output: the run failed
+ERROR_MARKERS = ("Traceback", "Exception in callback", "Timed out waiting")
+
+
+def result(value, unit, better="lower"):
+    return {"value": value, "unit": unit, "better": better}
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+
+def write_cert(workdir):
+    """Self-signed cert.pem / key.pem for server.py, which loads them from its cwd."""
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.x509.oid import NameOID
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (x509.CertificateBuilder()
+            .subject_name(name).issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256()))
+
+    with open(os.path.join(workdir, "cert.pem"), "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(os.path.join(workdir, "key.pem"), "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM,
+                                  serialization.PrivateFormat.TraditionalOpenSSL,
+                                  serialization.NoEncryption()))
+
+
+def spawn(workdir, script, *args):
+    """Start one of the repo's scripts with `workdir` as cwd, output to <script>.out."""
+    out = open(os.path.join(workdir, os.path.basename(script) + ".out"), "w")
+    return subprocess.Popen([PYTHON, os.path.join(ROOT, script), *args],
+                            cwd=workdir, stdout=out, stderr=subprocess.STDOUT)
+
+
+def reap(proc, timeout=None, interrupt=False):
+    """
+    Wait for `proc` and return its CPU seconds (user + system).
+
+    With interrupt=True the process is sent SIGINT first, which is how the
+    server and emulator are stopped so they flush their logs.
+    """
+    if interrupt:
+        proc.send_signal(signal.SIGINT)
+    deadline = time.time() + (timeout or 10)
+    while True:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return usage.ru_utime + usage.ru_stime
+        if time.time() > deadline:
+            proc.kill()
+            deadline = time.time() + 10
+        time.sleep(0.05)
+
+
+def check_run(workdir, client, sched, direction="upload",
+              scripts=("scheduler_client.py", "server.py")):
+    """
+    Raise if the client exited non-zero, any of `scripts` logged an error
+    (asyncio only logs exceptions raised in callbacks and keeps running) or
+    gave up draining, or stream chunks went missing. Returns load_run().
+    """
+    if client.returncode:
+        raise RuntimeError(f"client exited with {client.returncode}, see {workdir}")
+    for script in scripts:
+        with open(os.path.join(workdir, script + ".out")) as f:
+            output = f.read()
+        for marker in ERROR_MARKERS:
+            if marker in output:
+                raise RuntimeError(f"{script} logged {output.count(marker)} x {marker!r}, see {workdir}")
+
+    info, receive_log = load_run(workdir, sched, direction)
+    # datagrams may be lost for good; stream chunks may not
+    received = len({e["seq"] for e in receive_log})
+    if info["delivery"] == "stream" and info["chunks"] is not None and received < info["chunks"]:
+        raise RuntimeError(f"{received} of {info['chunks']} chunks received, see {workdir}")
+    return info, receive_log
+
+
+def run_dir(workdir, sched, direction="upload"):
+    """workdir/runs/<sched>, or workdir/runs/download/<sched> for a download."""
+    if direction == "download":
+        return os.path.join(workdir, "runs", "download", sched)
+    return os.path.join(workdir, "runs", sched)
+
+
+def load_run(workdir, sched, direction="upload"):
+    """
+    (run_info, receiver log) of a run: server_log.json, or receive_log.json
+    for a download, whose receiver is the client. Both have the same entries.
+    """
+    log_dir = run_dir(workdir, sched, direction)
+    log_name = "receive_log.json" if direction == "download" else "server_log.json"
+    with open(os.path.join(log_dir, "run_info.json")) as f:
+        info = json.load(f)
+    with open(os.path.join(log_dir, log_name)) as f:
+        receive_log = json.load(f)
+    return info, receive_log
+
+
+def hol_waits(server_log):
+    """
+    Head-of-line wait per chunk: how long it sat at the receiver before every
+    lower sequence number had also arrived and it could be delivered in order.
+    """
+    arrivals = {}
+    for entry in server_log:
+        if not entry["duplicate"]:
+            arrivals[entry["seq"]] = entry["timestamp"]
+
+    waits = []
+    delivered = 0.0
+    for seq in sorted(arrivals):
+        delivered = max(delivered, arrivals[seq])
+        waits.append(delivered - arrivals[seq])
+    return waits
@@ -0,0 +1,67 @@
+"""
+End-to-end throughput and CPU cost over loopback.
+
+Both client paths connect straight to server.py on 127.0.0.1 (no emulator),
+so the client and server themselves are the bottleneck. The client runs with
+both paths in one event loop and with one worker process per path, and the
+latter again against a server with several worker processes (--workers);
+CPU times include the workers'.
+"""
+import tempfile
+import time
+
+from benchmarks.common import (
+    CLIENT_TIMEOUT, STARTUP_DELAY, check_run, reap, result, spawn, write_cert,
+)
+from ring_buffer import supported as rings_supported
+
+SCHEDULERS = ["minrtt", "ecf"]
+# (client --workers, server --workers, result name suffix)
+WORKER_MODES = [("inline", 1, ""), ("process", 1, ".process"), ("process", 2, ".process.server2")]
+
+
+def run_once(sched, chunks, chunk_size, workers, server_workers=1):
+    with tempfile.TemporaryDirectory(prefix="mpquic-bench-") as workdir:
+        write_cert(workdir)
+        server = spawn(workdir, "server.py", "--workers", str(server_workers))
+        time.sleep(STARTUP_DELAY)
+
+        client = spawn(workdir, "scheduler_client.py", sched,
+                       "--local-a", "127.0.0.1", "--local-b", "127.0.0.1",
+                       "--server-a", "127.0.0.1:4443", "--server-b", "127.0.0.1:4443",
+                       "--chunks", str(chunks), "--chunk-size", str(chunk_size),
+                       "--workers", workers)
+        client_cpu = reap(client, timeout=CLIENT_TIMEOUT)
+        server_cpu = reap(server, interrupt=True)
+        info, server_log = check_run(workdir, client, sched)
+
+    duration = info["end"] - info["start"]
+    received = len({e["seq"] for e in server_log})
+    mb = chunks * chunk_size / 1e6
+    return {
+        "chunks_per_s": received / duration,
+        "client_cpu_per_mb": client_cpu / mb,
+        "server_cpu_per_mb": server_cpu / mb,
+    }
+
+
+def run(args):
+    results = {}
+    for workers, server_workers, suffix in WORKER_MODES:
+        if workers == "process" and not rings_supported():
+            print("*** loopback: skipping --workers process, which needs an x86 CPU")
+            continue
+        for sched in SCHEDULERS:
+            samples = [run_once(sched, args.chunks, args.chunk_size, workers, server_workers)
+                       for _ in range(args.repeat)]
+            # median of the repeats
+            pick = lambda key: sorted(s[key] for s in samples)[len(samples) // 2]
+
+            prefix = f"loopback.{sched}{suffix}"
+            results[f"{prefix}.chunks_per_s"] = result(pick("chunks_per_s"), "chunks/s", "higher")
+            results[f"{prefix}.client_cpu_per_mb"] = result(pick("client_cpu_per_mb"), "cpu-s/MB")
+            results[f"{prefix}.server_cpu_per_mb"] = result(pick("server_cpu_per_mb"), "cpu-s/MB")
+            print(f"*** loopback {sched:10s} {workers:8s} server x{server_workers} {pick('chunks_per_s'):8.0f} chunks/s  "
+                  f"client {pick('client_cpu_per_mb'):.3f} cpu-s/MB  "
+                  f"server {pick('server_cpu_per_mb'):.3f} cpu-s/MB")
+    return results
@@ -0,0 +1,89 @@
+"""
+Microbenchmarks of the client's per-chunk work, without any network.
+
+Paths are real (unconnected) aioquic QuicConnections behind a minimal
+protocol stand-in, so PathState and the schedulers run their normal code.
+"""
+import random
+import statistics
+import time
+import timeit
+
+from aioquic.quic.configuration import QuicConfiguration
+from aioquic.quic.connection import QuicConnection
+
+import scheduler_client as client
+from benchmarks.common import result
+
+HISTORY_LENGTHS = [100, 1000, 10000]
+DECISION_HISTORY = 1000  # RTT samples per path when timing scheduler decisions
+CHUNK_SIZE = 500
+REPEATS = 11  # median of these; a single best-of run swings by 30% on shared hosts
+
+
+class OfflineConnection:
+    """Just enough of a QuicConnectionProtocol for PathState."""
+
+    def __init__(self):
+        self._quic = QuicConnection(configuration=QuicConfiguration(is_client=True))
+
+    def transmit(self):
+        pass
+
+
+def make_path(name, history, base_rtt):
+    conn = OfflineConnection()
+    path = client.PathState(name, conn, stream_id=0)
+    rng = random.Random(name)
+    path.rtts = [base_rtt + rng.uniform(0, 0.005) for _ in range(history)]
+
+    # look like a path that has been sending for a while
+    now = time.time()
+    path.first_send_time = now - 1.0
+    path.last_send_time = now
+    path.bytes_sent = 1_000_000
+    path.delivery_rate = 1_000_000.0
+    loss = conn._quic._loss
+    loss._rtt_initialized = True
+    loss._rtt_smoothed = base_rtt
+    return path
+
+
+def time_per_call(fn):
+    """Median-of-REPEATS nanoseconds per call of fn(), each repeat running >= 0.2s."""
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    return statistics.median(timer.repeat(REPEATS, loops)) / loops * 1e9
+
+
+def run(args):
+    cases = []  # (result name, fn, unit, label)
+    for sched in client.VALID_SCHEDULERS:
+        pathA = make_path("A", DECISION_HISTORY, 0.010)
+        pathB = make_path("B", DECISION_HISTORY, 0.050)
+        usable = [pathA, pathB]
+        cases.append((f"micro.decision.{sched}",
+                      lambda sched=sched, pathA=pathA, pathB=pathB, usable=usable:
+                      client.choose_paths(sched, pathA, pathB, usable, CHUNK_SIZE),
+                      "ns/chunk", f"decision {sched:10s}"))
+
+    for history in HISTORY_LENGTHS:
+        path = make_path("A", history, 0.010)
+        for prop in ["rtt", "jitter", "bw", "srtt"]:
+            cases.append((f"micro.pathstate.{prop}.{history}",
+                          lambda path=path, prop=prop: getattr(path, prop),
+                          "ns/access", f"PathState.{prop:6s} history={history:5d}"))
+
+    # --repeat times every case again after all the others, so a slow spell
+    # of the host lands in one round rather than on one case
+    samples = {name: [] for name, _, _, _ in cases}
+    for _ in range(args.repeat):
+        for name, fn, _, _ in cases:
+            samples[name].append(time_per_call(fn))
+
+    results = {}
+    for name, _, unit, label in cases:
+        ns = statistics.median(samples[name])
+        results[name] = result(ns, unit)
+        print(f"*** micro {label} {ns:12.0f} {unit}")
+    return results
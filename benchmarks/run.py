@@ -0,0 +1,138 @@
+"""
+Run the benchmark suite and compare against the committed baseline.
+
+    python -m benchmarks.run                        # all layers, compare to baseline
+    python -m benchmarks.run micro --repeat 3       # just the microbenchmarks
+    python -m benchmarks.run --save-baseline        # record a new baseline
+
+Exits with status 1 if any result is worse than the baseline by more than
+its layer's threshold (a fraction of the baseline value).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from abr import ABR_ALGORITHMS, DEFAULT_SEGMENTS
+from benchmarks import loopback, micro, topologies
+from benchmarks.common import ROOT
+
+LAYERS = {
+    "micro": micro,
+    "loopback": loopback,
+    "topologies": topologies,
+}
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+
+def compare(results, baseline, thresholds):
+    """
+    Print a comparison table and return the names of regressed results.
+    `thresholds` maps a layer to its allowed fractional slowdown; results are
+    named <layer>.*, or topo<N>.* for the topologies layer.
+    """
+    regressions = []
+    for name, res in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            print(f"    {name:45s} {res['value']:12.3f} {res['unit']:10s} (new)")
+            continue
+
+        # positive delta = worse, as a fraction of the baseline
+        delta = res["value"] - base["value"]
+        if res["better"] == "higher":
+            delta = -delta
+        change = delta / abs(base["value"]) if base["value"] else (1.0 if delta > 0 else 0.0)
+
+        mark = ""
+        if change > thresholds["micro" if name.startswith("micro.") else "end-to-end"]:
+            mark = "  REGRESSION"
+            regressions.append(name)
+        print(f"    {name:45s} {res['value']:12.3f} {res['unit']:10s} "
+              f"base {base['value']:12.3f} {-change:+7.1%}{mark}")
+    return regressions
+
+
+def main(args):
+    unknown = set(args.layers) - set(LAYERS)
+    if unknown:
+        print(f"*** Unknown layer(s): {', '.join(sorted(unknown))}")
+        return 2
+
+    results = {}
+    for layer in args.layers or LAYERS:
+        print(f"=== {layer} ===")
+        results.update(LAYERS[layer].run(args))
+
+    with open(args.out, "w") as f:
+        json.dump({
+            "time": time.time(),
+            "host": platform.node(),
+            "python": platform.python_version(),
+            "results": results,
+        }, f, indent=2)
+    print(f"*** Wrote {args.out}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)["results"]
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "results": baseline}, f, indent=2)
+        print(f"*** Saved baseline {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"*** No baseline at {args.baseline}, nothing to compare")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+
+    thresholds = {"micro": args.micro_threshold, "end-to-end": args.threshold}
+    print(f"=== compared to {args.baseline} (threshold {args.threshold:.0%}, "
+          f"micro {args.micro_threshold:.0%}) ===")
+    regressions = compare(results, baseline, thresholds)
+    if regressions:
+        print(f"*** {len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("*** No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MPQUIC benchmark suite")
+    parser.add_argument("layers", nargs="*", help=f"layers to run: {', '.join(LAYERS)} (default: all)")
+    parser.add_argument("--out", default="bench_results.json", help="results JSON")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="merge these results into the baseline instead of comparing")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed fractional slowdown of a loopback or topology result")
+    parser.add_argument("--micro-threshold", type=float, default=1.0,
+                        help="allowed fractional slowdown of a microbenchmark; nanosecond "
+                             "timings move with the host's load more than end-to-end runs")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="runs per case, or rounds of microbenchmarks "
+                             "(the median is reported)")
+    parser.add_argument("--chunks", type=int, default=10000, help="chunks per loopback run")
+    parser.add_argument("--topo-chunks", type=int, default=500, help="chunks per topology run")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--topologies", type=int, nargs="+", default=topologies.TOPOLOGIES)
+    parser.add_argument("--schedulers", nargs="+", help="schedulers for the topology runs")
+    parser.add_argument("--directions", nargs="+", choices=topologies.DIRECTIONS,
+                        default=topologies.DIRECTIONS,
+                        help="upload (client schedules) and/or download (server schedules)")
+    parser.add_argument("--queue-size", type=int, default=topologies.QUEUE_SIZE,
+                        help="emulator bottleneck queue (packets) for the topology runs")
+    parser.add_argument("--pacing", action="store_true",
+                        help="run the topology clients with --pacing (results named *.paced.*)")
+    parser.add_argument("--abr", choices=ABR_ALGORITHMS,
+                        help="stream --segments segments with this ABR controller in the topology "
+                             "runs, adding QoE results (named *.<abr>.*)")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS)
+
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+"""
+Scheduler quality on the fixed topologies.
+
+Each scheduler runs over link_emulator.py replaying traces/topo<N>_{a,b}.csv,
+the userspace equivalents of the four Mininet topologies, once per
+direction: uploads (client schedules) and downloads (server schedules;
+results named topo<N>.<sched>.download.*). With --pacing the sender paces
+its paths (results named ...paced.*); with --abr it streams segments chosen
+by that ABR controller and the results add the run's QoE (named ...<abr>.*).
+"""
+import json
+import os
+import re
+import tempfile
+import time
+
+from abr import evaluate
+from benchmarks.common import (
+    CLIENT_TIMEOUT, ROOT, STARTUP_DELAY, check_run, hol_waits, percentile, reap, result,
+    run_dir, spawn, write_cert,
+)
+from scheduler_client import DIRECTION_UPLOAD, VALID_DIRECTIONS, VALID_SCHEDULERS
+
+TOPOLOGIES = [1, 2, 3, 4]
+DIRECTIONS = VALID_DIRECTIONS
+QUEUE_SIZE = 50  # packets, as in mpquic_topo.py (Topology 1's path A has 20)
+
+
+def queue_drops(workdir, direction=DIRECTION_UPLOAD):
+    """Packets dropped at the emulator's bottleneck queues in the direction the chunks went."""
+    link = "up" if direction == DIRECTION_UPLOAD else "down"
+    with open(os.path.join(workdir, "link_emulator.py.out")) as f:
+        return sum(int(n) for n in re.findall(link + r" \d+ sent / (\d+) dropped", f.read()))
+
+
+def run_once(sched, topo, chunks, chunk_size, client_args=(), queue_size=QUEUE_SIZE,
+             direction=DIRECTION_UPLOAD):
+    traces = os.path.join(ROOT, "traces")
+    with tempfile.TemporaryDirectory(prefix="mpquic-bench-") as workdir:
+        write_cert(workdir)
+        server = spawn(workdir, "server.py")
+        emulator = spawn(workdir, "link_emulator.py",
+                         "--trace-a", os.path.join(traces, f"topo{topo}_a.csv"),
+                         "--trace-b", os.path.join(traces, f"topo{topo}_b.csv"),
+                         "--queue-size", str(queue_size))
+        time.sleep(STARTUP_DELAY)
+
+        client = spawn(workdir, "scheduler_client.py", sched,
+                       "--local-a", "127.0.0.1", "--local-b", "127.0.0.1",
+                       "--server-a", "127.0.0.1:4501", "--server-b", "127.0.0.1:4502",
+                       "--direction", direction,
+                       "--chunks", str(chunks), "--chunk-size", str(chunk_size), *client_args)
+        reap(client, timeout=CLIENT_TIMEOUT)
+        reap(emulator, interrupt=True)
+        reap(server, interrupt=True)
+        info, receive_log = check_run(workdir, client, sched, direction)
+        drops = queue_drops(workdir, direction)
+        qoe = {}
+        if info.get("abr"):
+            with open(os.path.join(run_dir(workdir, sched, direction), "segments.json")) as f:
+                qoe = evaluate(json.load(f)["plan"], receive_log)
+
+    latencies = [e["latency"] for e in receive_log if not e["duplicate"]]
+    waits = hol_waits(receive_log)
+    return {
+        "qoe": qoe.get("qoe"),
+        "stall_s": qoe.get("stall_time"),
+        "completion_s": info["end"] - info["start"],
+        "latency_p95_ms": percentile(latencies, 95) * 1000,
+        "hol_wait_mean_ms": sum(waits) / len(waits) * 1000 if waits else 0.0,
+        "duplicates": sum(e["duplicate"] for e in receive_log),
+        "queue_drops": drops,
+    }
+
+
+def run(args):
+    results = {}
+    client_args = (["--pacing"] if args.pacing else []) + \
+        (["--abr", args.abr, "--segments", str(args.segments)] if args.abr else [])
+    for topo in args.topologies:
+        for direction in args.directions:
+            for sched in args.schedulers or VALID_SCHEDULERS:
+                samples = [run_once(sched, topo, args.topo_chunks, args.chunk_size, client_args,
+                                    args.queue_size, direction)
+                           for _ in range(args.repeat)]
+                pick = lambda key: sorted(s[key] for s in samples)[len(samples) // 2]
+
+                prefix = f"topo{topo}.{sched}" + \
+                    (".download" if direction != DIRECTION_UPLOAD else "") + \
+                    (".paced" if args.pacing else "") + (f".{args.abr}" if args.abr else "")
+                results[f"{prefix}.completion_s"] = result(pick("completion_s"), "s")
+                results[f"{prefix}.latency_p95_ms"] = result(pick("latency_p95_ms"), "ms")
+                results[f"{prefix}.hol_wait_mean_ms"] = result(pick("hol_wait_mean_ms"), "ms")
+                results[f"{prefix}.duplicates"] = result(pick("duplicates"), "chunks")
+                results[f"{prefix}.queue_drops"] = result(pick("queue_drops"), "packets")
+                if args.abr:
+                    results[f"{prefix}.qoe"] = result(pick("qoe"), "per segment", better="higher")
+                    results[f"{prefix}.stall_s"] = result(pick("stall_s"), "s")
+                print(f"*** topo{topo} {direction:8s} {sched:10s} "
+                      f"done={pick('completion_s'):.2f}s p95={pick('latency_p95_ms'):.0f}ms "
+                      f"hol={pick('hol_wait_mean_ms'):.1f}ms dup={pick('duplicates')} "
+                      f"drops={pick('queue_drops')}")
+    return results
@@ -0,0 +1,164 @@
+"""
+Coupled multipath congestion control for the per-path QUIC connections.
+
+Each path normally runs its own Reno controller, so two paths sharing a
+bottleneck take twice the share of a single-path flow. Here every path's
+controller joins a CoupledGroup that sees all paths' windows and RTTs and
+couples the congestion-avoidance increase (and, for BALIA, the decrease):
+
+    lia    RFC 6356 Linked Increases
+    balia  Balanced Linked Adaptation (Peng et al., 2016)
+
+Slow start, recovery periods and persistent congestion behave like aioquic's
+Reno. Install with `install(quic, group)` before the connection sends anything.
+"""
+from aioquic.quic.congestion.base import (
+    K_MINIMUM_WINDOW,
+    QuicCongestionControl,
+    QuicRttMonitor,
+)
+
+INITIAL_RTT = 0.1  # seconds, used until a path has an RTT sample
+RTT_GAIN = 0.125   # EWMA gain for the per-path smoothed RTT
+
+
+class CoupledGroup:
+    """
+    The set of coupled path controllers of one multipath session.
+
+    Couples the increase as LIA does and halves the window on a congestion
+    event; other algorithms override either.
+    """
+
+    name = "coupled"
+
+    def __init__(self):
+        self.subflows = []
+
+    def total_cwnd(self):
+        return sum(cc.congestion_window for cc in self.subflows)
+
+    def alpha(self):
+        total = self.total_cwnd()
+        best = max(cc.congestion_window / cc.rtt ** 2 for cc in self.subflows)
+        denom = sum(cc.congestion_window / cc.rtt for cc in self.subflows) ** 2
+        return total * best / denom
+
+    def increase(self, cc, acked_bytes):
+        """Congestion-avoidance window increase (bytes) for `acked_bytes` ACKed on `cc`."""
+        mss = cc.max_datagram_size
+        coupled = self.alpha() * acked_bytes * mss / self.total_cwnd()
+        uncoupled = acked_bytes * mss / cc.congestion_window
+        return min(coupled, uncoupled)
+
+    def decrease_factor(self, cc):
+        """Multiplier applied to `cc`'s window on a congestion event."""
+        return 0.5
+
+
+class LiaGroup(CoupledGroup):
+    """RFC 6356 Linked Increases, as CoupledGroup implements it."""
+
+    name = "lia"
+
+
+class BaliaGroup(CoupledGroup):
+    name = "balia"
+
+    def _rates(self, cc):
+        """(x_r, sum_k x_k, alpha_r) with windows in packets."""
+        rates = [s.congestion_window / s.max_datagram_size / s.rtt for s in self.subflows]
+        x_r = cc.congestion_window / cc.max_datagram_size / cc.rtt
+        return x_r, sum(rates), max(rates) / x_r
+
+    def increase(self, cc, acked_bytes):
+        x_r, x_sum, alpha = self._rates(cc)
+        packets = acked_bytes / cc.max_datagram_size
+        per_packet = x_r / (cc.rtt * x_sum ** 2) * ((1 + alpha) / 2) * ((4 + alpha) / 5)
+        return packets * per_packet * cc.max_datagram_size
+
+    def decrease_factor(self, cc):
+        _, _, alpha = self._rates(cc)
+        return 1 - min(alpha, 1.5) / 2
+
+
+COUPLED_ALGORITHMS = {
+    LiaGroup.name: LiaGroup,
+    BaliaGroup.name: BaliaGroup,
+}
+
+
+class CoupledCongestionControl(QuicCongestionControl):
+    """Reno-shaped controller whose avoidance phase is driven by its group."""
+
+    def __init__(self, group, *, max_datagram_size):
+        super().__init__(max_datagram_size=max_datagram_size)
+        self.group = group
+        self.max_datagram_size = max_datagram_size
+        self.rtt = INITIAL_RTT
+        self._rtt_sampled = False
+        self._congestion_recovery_start_time = 0.0
+        self._increase_stash = 0.0
+        self._rtt_monitor = QuicRttMonitor()
+        group.subflows.append(self)
+
+    def on_packet_acked(self, *, now, packet):
+        self.bytes_in_flight -= packet.sent_bytes
+
+        # don't increase window in congestion recovery
+        if packet.sent_time <= self._congestion_recovery_start_time:
+            return
+
+        if self.ssthresh is None or self.congestion_window < self.ssthresh:
+            # slow start
+            self.congestion_window += packet.sent_bytes
+        else:
+            # coupled congestion avoidance
+            self._increase_stash += self.group.increase(self, packet.sent_bytes)
+            whole = int(self._increase_stash)
+            if whole:
+                self._increase_stash -= whole
+                self.congestion_window += whole
+
+    def on_packet_sent(self, *, packet):
+        self.bytes_in_flight += packet.sent_bytes
+
+    def on_packets_expired(self, *, packets):
+        for packet in packets:
+            self.bytes_in_flight -= packet.sent_bytes
+
+    def on_packets_lost(self, *, now, packets):
+        lost_largest_time = 0.0
+        for packet in packets:
+            self.bytes_in_flight -= packet.sent_bytes
+            lost_largest_time = packet.sent_time
+
+        # start a new congestion event if packet was sent after the
+        # start of the previous congestion recovery period.
+        if lost_largest_time > self._congestion_recovery_start_time:
+            self._congestion_recovery_start_time = now
+            self.congestion_window = max(
+                int(self.congestion_window * self.group.decrease_factor(self)),
+                K_MINIMUM_WINDOW * self.max_datagram_size,
+            )
+            self.ssthresh = self.congestion_window
+
+    def on_persistent_congestion(self):
+        self.congestion_window = K_MINIMUM_WINDOW * self.max_datagram_size
+        self._congestion_recovery_start_time = 0.0
+
+    def on_rtt_measurement(self, *, now, rtt):
+        if self._rtt_sampled:
+            self.rtt += RTT_GAIN * (rtt - self.rtt)
+        else:
+            self.rtt = rtt
+            self._rtt_sampled = True
+
+        # check whether we should exit slow start
+        if self.ssthresh is None and self._rtt_monitor.is_rtt_increasing(now=now, rtt=rtt):
+            self.ssthresh = self.congestion_window
+
+
+def install(quic, group):
+    """Replace a QuicConnection's congestion controller with a coupled one."""
+    quic._loss._cc = CoupledCongestionControl(group, max_datagram_size=quic._max_datagram_size)
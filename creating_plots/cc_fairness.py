@@ -0,0 +1,44 @@
+import json, os, matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+SCHEDULERS = ["minrtt","wrr","redundant","predict","ecf"]
+
+labels = []
+goodput = {"A": [], "B": []}
+
+for sched in SCHEDULERS:
+    f = f"runs/{sched}/run_info.json"
+    if not os.path.exists(f):
+        print(f"Missing {f}, skipping")
+        continue
+
+    info = json.load(open(f))
+    duration = info["end"] - info["start"]
+    if duration <= 0:
+        continue
+
+    rates = {p: info["acked_bytes"][p] * 8 / duration / 1e6 for p in goodput}
+    total = sum(rates.values())
+    # Jain's index over the two paths: 1 = equal share, 0.5 = one path only
+    jain = total ** 2 / (len(rates) * sum(r ** 2 for r in rates.values())) if total else 0.0
+    print(f"{sched:10s} cc={info['cc']:6s} aggregate={total:.2f} Mbps "
+          f"A={rates['A']:.2f} B={rates['B']:.2f} jain={jain:.3f}")
+
+    labels.append(f"{sched}\n({info['cc']})")
+    for p in goodput:
+        goodput[p].append(rates[p])
+
+os.makedirs("plots", exist_ok=True)
+
+plt.figure(figsize=(7,4))
+x = range(len(labels))
+plt.bar(x, goodput["A"], label="Path A")
+plt.bar(x, goodput["B"], bottom=goodput["A"], label="Path B")
+plt.xticks(x, labels)
+plt.ylabel("Goodput (Mbps)")
+plt.title("Aggregate Goodput and Per-Path Share")
+plt.legend()
+plt.tight_layout()
+plt.savefig("plots/plot_cc_fairness.png", dpi=200)
+print("✅ saved plots/plot_cc_fairness.png")
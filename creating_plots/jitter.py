@@ -3,7 +3,7 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import numpy as np
 
-SCHEDULERS = ["minrtt","wrr","redundant","predict"]
+SCHEDULERS = ["minrtt","wrr","redundant","predict","ecf"]
 
 labels = []
 jitters = []
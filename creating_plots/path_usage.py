@@ -2,7 +2,7 @@ import json, os, matplotlib
 matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
-SCHEDULERS = ["minrtt","wrr","redundant","predict"]
+SCHEDULERS = ["minrtt","wrr","redundant","predict","ecf"]
 
 counts = {"A":[],"B":[],"A+B":[]}
 labels = []
@@ -3,7 +3,7 @@ matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 from datetime import datetime
 
-SCHEDS = ["minrtt", "wrr", "redundant", "predict"]
+SCHEDS = ["minrtt", "wrr", "redundant", "predict", "ecf"]
 BASE_DIR = "runs"
 
 
@@ -26,7 +26,7 @@ def extract_cwnd_data(log):
 
 def main():
     # Create figure with subplots for each scheduler
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+    fig, axes = plt.subplots(2, 3, figsize=(20, 10))
     axes = axes.flatten()
 
     for idx, sched in enumerate(SCHEDS):
@@ -62,9 +62,13 @@ def main():
         ax.grid(True, linestyle="--", alpha=0.4)
         ax.legend()
 
+    for ax in axes[len(SCHEDS):]:
+        ax.set_visible(False)
+
     plt.tight_layout()
-    plt.savefig("cwnd_comparison.png", dpi=150)
-    print("✅ Saved cwnd_comparison.png")
+    os.makedirs("plots", exist_ok=True)
+    plt.savefig("plots/cwnd_comparison.png", dpi=150)
+    print("✅ Saved plots/cwnd_comparison.png")
 
     # Also create a single plot comparing all schedulers on same graph
     fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 10))
@@ -107,8 +111,8 @@ def main():
     ax2.legend()
 
     plt.tight_layout()
-    plt.savefig("cwnd_all_schedulers.png", dpi=150)
-    print("✅ Saved cwnd_all_schedulers.png")
+    plt.savefig("plots/cwnd_all_schedulers.png", dpi=150)
+    print("✅ Saved plots/cwnd_all_schedulers.png")
 
 
 if __name__ == "__main__":
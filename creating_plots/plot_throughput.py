@@ -4,14 +4,15 @@ import matplotlib.pyplot as plt
 from datetime import datetime
 import numpy as np
 
-SCHEDS = ["minrtt", "wrr", "redundant", "predict"]
+SCHEDS = ["minrtt", "wrr", "redundant", "predict", "ecf"]
 BASE_DIR = "runs"
 CHUNK_SIZE_BYTES = 500  # matches the client code
 COLORS = {
     "minrtt": "#2E86AB",      # Blue
     "wrr": "#A23B72",         # Purple
     "redundant": "#F18F01",   # Orange
-    "predict": "#06A77D"      # Green
+    "predict": "#06A77D",     # Green
+    "ecf": "#C73E1D"          # Red
 }
 
 
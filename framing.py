@@ -0,0 +1,150 @@
+"""
+Application framing shared by scheduler_client.py and server.py.
+
+Each stream starts with a header line announcing the run, followed by
+length-prefixed chunks:
+
+    SCHED:<scheduler>:<run id>:<path>[:<logical stream>]\\n
+    [seq u32][frame length u32][send time f64][padding ...]
+
+With --streams every logical stream (streams.py) has a QUIC stream of its
+own on each path, named by the header's last field.
+
+With --delivery datagram|auto, chunks may instead travel one per unreliable
+QUIC DATAGRAM frame, in the same [seq][length][send time] format; the
+connection's stream header still names the run and path.
+
+The sequence number lets the receiver spot duplicates (redundant scheduling,
+failover resends), measure reordering across paths and count datagrams that
+never arrived. The send time gives one-way latency, since client and server
+share a clock under Mininet and the userspace emulator. A chunk is at least
+CHUNK_HEADER.size (16) bytes.
+
+In download mode (scheduler_client.py --direction download) the client
+opens the streams and sends a request line on each instead:
+
+    GET:<scheduler>:<run id>:<path>:<chunks>:<chunk size>:<delivery>:<pacing burst>:<abr>:<segments>\\n
+
+(pacing burst 0 = unpaced; abr "none" = a fixed number of chunks, otherwise
+the controller in abr.py sending that many segments). The server answers on
+the same streams with the header line and chunks above, scheduled over its
+own connections, or with
+
+    REFUSED:<reason>\\n
+
+and the end of the stream if it cannot serve the download.
+"""
+import struct
+import time
+
+CHUNK_HEADER = struct.Struct("!IId")
+
+# DATAGRAM frames must fit in one packet: the largest chunk sent as one
+MAX_DATAGRAM_CHUNK = 1100
+# max_datagram_frame_size transport parameter offered by client and server
+MAX_DATAGRAM_FRAME_SIZE = 65536
+
+
+def make_header(sched, run_id, path_name, stream_name=None):
+    name = f":{stream_name}" if stream_name else ""
+    return f"SCHED:{sched}:{run_id}:{path_name}{name}\n".encode()
+
+
+def parse_header(line):
+    """
+    Return (sched, run_id, path) from a header line, and the logical stream
+    name or None; missing fields are 'unknown'.
+    """
+    fields = line.decode(errors="ignore").strip().split(":")[1:]
+    stream_name = fields[3] if len(fields) > 3 else None
+    fields += ["unknown"] * (3 - len(fields))
+    return tuple(fields[:3]), stream_name
+
+
+def make_refusal(reason):
+    return f"REFUSED:{reason}\n".encode()
+
+
+def make_request(sched, run_id, path_name, chunks, chunk_size, delivery, pacing_burst=0,
+                 abr=None, segments=0):
+    return (f"GET:{sched}:{run_id}:{path_name}:{chunks}:{chunk_size}:{delivery}:"
+            f"{pacing_burst}:{abr or 'none'}:{segments}\n").encode()
+
+
+def parse_request(line):
+    """
+    Return (sched, run_id, path, chunks, chunk_size, delivery, pacing_burst,
+    abr, segments) from a request line; abr is None for a fixed number of chunks.
+    """
+    sched, run_id, path_name, chunks, chunk_size, delivery, burst, abr, segments = \
+        line.decode(errors="ignore").strip().split(":")[1:10]
+    return (sched, run_id, path_name, int(chunks), int(chunk_size), delivery, int(burst),
+            None if abr == "none" else abr, int(segments))
+
+
+def make_chunk(seq, size, created=None):
+    """
+    Build a chunk of `size` bytes carrying its sequence number and send time
+    (or the time it was `created`, to count time queued at the sender).
+    """
+    if size < CHUNK_HEADER.size:
+        raise ValueError(f"chunk size {size} is below the {CHUNK_HEADER.size}-byte chunk header")
+    return CHUNK_HEADER.pack(seq, size, created or time.time()) + b"x" * (size - CHUNK_HEADER.size)
+
+
+def parse_datagram(data):
+    """Return (seq, size, send_time) of a chunk received as a DATAGRAM frame, or None."""
+    if len(data) < CHUNK_HEADER.size:
+        return None
+    return CHUNK_HEADER.unpack_from(data)
+
+
+class ChunkReader:
+    """
+    Reassembles the header line and chunks from stream data fragments.
+
+    A download request line also sets `request`; `header` then holds its
+    (sched, run_id, path). `stream` is the logical stream named by the
+    header, if any. A server's refusal of a download sets `refused` to its
+    reason instead.
+    """
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.header = None
+        self.stream = None
+        self.request = None
+        self.refused = None
+
+    def feed(self, data):
+        """Add stream data; return the (seq, size, send_time) of every completed chunk."""
+        self.buf += data
+
+        if self.header is None:
+            end = self.buf.find(b"\n")
+            if end < 0:
+                return []
+            line = bytes(self.buf[:end])
+            if line.startswith(b"GET:"):
+                self.request = parse_request(line)
+                self.header = self.request[:3]
+            elif line.startswith(b"REFUSED:"):
+                self.refused = line[len(b"REFUSED:"):].decode(errors="ignore")
+                del self.buf[:]
+                return []
+            else:
+                self.header, self.stream = parse_header(line)
+            del self.buf[:end + 1]
+
+        chunks = []
+        pos = 0
+        while len(self.buf) - pos >= CHUNK_HEADER.size:
+            seq, size, sent = CHUNK_HEADER.unpack_from(self.buf, pos)
+            if size < CHUNK_HEADER.size:
+                raise ValueError(f"corrupt stream: chunk {seq} claims {size} bytes")
+            if len(self.buf) - pos < size:
+                break
+            chunks.append((seq, size, sent))
+            pos += size
+        del self.buf[:pos]
+        return chunks
@@ -8,6 +8,8 @@ python3 creating_plots/path_usage.py
 python3 creating_plots/plot_throughput.py
 python3 creating_plots/rtt.py
 python3 creating_plots/plot_logs.py
+python3 creating_plots/plot_cwnd.py
+python3 creating_plots/cc_fairness.py
 
 echo ""
 echo "All plots generated successfully!"
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Userspace two-path link emulator for running the client and server without Mininet.
+
+Each path is a UDP relay: the client talks to a local port per path, and the
+emulator forwards to the server through a bottleneck queue with bandwidth,
+delay and loss taken from the same traces mpquic_topo.py replays. Like the
+Mininet topologies, a path is modelled as two links in series, so trace values
+mean exactly what the TCLink arguments mean there.
+
+    python3 link_emulator.py --trace-a traces/topo2_a.csv --trace-b traces/topo2_b.csv
+    python3 scheduler_client.py minrtt --server-a 127.0.0.1:4501 --server-b 127.0.0.1:4502 \
+        --local-a 127.0.0.1 --local-b 127.0.0.1
+
+The trace timeline starts with the first client packet and is appended to
+runs/link_trace.json (and runs/link_events.json for --link-events) on exit.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from link_traces import (
+    LINK_EVENT_LOG,
+    LINK_TRACE_LOG,
+    PATHS,
+    append_timeline,
+    load_link_events,
+    load_trace,
+    trace_duration,
+)
+
+HOPS = 2  # links per path, as in the Mininet topologies
+
+
+class LinkDirection:
+    """
+    One direction of an emulated path: a FIFO bottleneck queue drained at
+    `bw`, then `delay` per hop, with independent `loss` on each hop.
+    """
+
+    def __init__(self, loop, deliver):
+        self.loop = loop
+        self.deliver = deliver
+
+        self.bw = None          # Mbps, None = unlimited
+        self.delay = 0.0        # ms per hop
+        self.loss = 0.0         # % per hop
+        self.queue_size = None  # packets, None = unlimited
+        self.up = True
+
+        self.busy_until = 0.0
+        self.queued = 0
+
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, data, addr):
+        if not self.up or random.random() >= (1 - self.loss / 100) ** HOPS:
+            self.dropped += 1
+            return
+
+        now = self.loop.time()
+        depart = now
+        if self.bw:
+            if self.queue_size is not None and self.queued >= self.queue_size:
+                self.dropped += 1  # tail drop, like a full netem/htb queue
+                return
+            self.busy_until = max(now, self.busy_until) + len(data) * 8 / (self.bw * 1e6)
+            depart = self.busy_until
+            self.queued += 1
+            self.loop.call_at(depart, self._dequeued)
+
+        self.sent += 1
+        self.loop.call_at(depart + HOPS * self.delay / 1000, self.deliver, data, addr)
+
+    def _dequeued(self):
+        self.queued -= 1
+
+
+class ClientSide(asyncio.DatagramProtocol):
+    """Listening socket the client sends to for one path."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def connection_made(self, transport):
+        self.path.client_transport = transport
+
+    def datagram_received(self, data, addr):
+        self.path.from_client(data, addr)
+
+
+class ServerSide(asyncio.DatagramProtocol):
+    """Socket the emulator uses to reach the server for one path."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def connection_made(self, transport):
+        self.path.server_transport = transport
+
+    def datagram_received(self, data, addr):
+        self.path.from_server(data)
+
+
+class EmulatedPath:
+    def __init__(self, loop, name, server_addr, started):
+        self.name = name
+        self.server_addr = server_addr
+        self.started = started
+
+        self.client_addr = None
+        self.client_transport = None
+        self.server_transport = None
+
+        self.uplink = LinkDirection(loop, lambda d, a: self.server_transport.sendto(d, a))
+        self.downlink = LinkDirection(loop, lambda d, a: self.client_transport.sendto(d, a))
+
+    def from_client(self, data, addr):
+        self.client_addr = addr
+        self.started.set()
+        self.uplink.send(data, self.server_addr)
+
+    def from_server(self, data):
+        if self.client_addr is not None:
+            self.downlink.send(data, self.client_addr)
+
+    def set_conditions(self, bw, delay, loss, queue_size=None):
+        for d in (self.uplink, self.downlink):
+            if bw is not None:
+                d.bw = bw
+            if delay is not None:
+                d.delay = delay
+            if loss is not None:
+                d.loss = loss
+            if queue_size is not None:
+                d.queue_size = queue_size
+
+    def set_up(self, up):
+        self.uplink.up = up
+        self.downlink.up = up
+
+
+async def replay_trace(path, trace, repeat, applied):
+    await path.started.wait()
+    start = time.time()
+    while True:
+        for t, bw, delay, loss in trace:
+            wait = start + t - time.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            path.set_conditions(bw, delay, loss)
+            applied.append({
+                "time": time.time(),
+                "offset": time.time() - start,
+                "path": path.name,
+                "bw": bw,
+                "delay": delay,
+                "loss": loss,
+            })
+        if not repeat:
+            return
+        start += trace_duration(trace) or 1.0
+
+
+async def replay_link_events(paths, events, applied):
+    await paths["A"].started.wait()
+    start = time.time()
+    for t, path_name, state in events:
+        wait = start + t - time.time()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        paths[path_name].set_up(state == "up")
+        applied.append({"time": time.time(), "offset": t, "path": path_name, "state": state})
+        print(f"*** Link event: path {path_name} {state}")
+
+
+def parse_addr(s):
+    host, port = s.rsplit(":", 1)
+    return host, int(port)
+
+
+async def main(args):
+    loop = asyncio.get_running_loop()
+    started = asyncio.Event()
+    server = parse_addr(args.server)
+
+    paths = {}
+    for name, port in zip(PATHS, (args.port_a, args.port_b)):
+        path = EmulatedPath(loop, name, server, started)
+        path.set_conditions(None, None, None, args.queue_size)
+        await loop.create_datagram_endpoint(lambda p=path: ClientSide(p), local_addr=(args.listen, port))
+        await loop.create_datagram_endpoint(lambda p=path: ServerSide(p), local_addr=(args.listen, 0))
+        paths[name] = path
+        print(f"*** Path {name}: {args.listen}:{port} -> {server[0]}:{server[1]}")
+
+    trace_log, event_log = [], []
+    tasks = []
+    for name, trace_file in zip(PATHS, (args.trace_a, args.trace_b)):
+        if trace_file:
+            tasks.append(asyncio.ensure_future(
+                replay_trace(paths[name], load_trace(trace_file), args.repeat, trace_log)))
+    if args.link_events:
+        tasks.append(asyncio.ensure_future(
+            replay_link_events(paths, load_link_events(args.link_events), event_log)))
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for t in tasks:
+            t.cancel()
+        append_timeline(LINK_TRACE_LOG, trace_log)
+        append_timeline(LINK_EVENT_LOG, event_log)
+        for name, path in paths.items():
+            print(f"*** Path {name}: up {path.uplink.sent} sent / {path.uplink.dropped} dropped, "
+                  f"down {path.downlink.sent} sent / {path.downlink.dropped} dropped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Userspace two-path link emulator")
+    parser.add_argument("--trace-a", help="trace for path A (CSV or Mahimahi)")
+    parser.add_argument("--trace-b", help="trace for path B (CSV or Mahimahi)")
+    parser.add_argument("--link-events", help="link up/down event script")
+    parser.add_argument("--repeat", action="store_true", help="loop traces when they end")
+    parser.add_argument("--queue-size", type=int, help="bottleneck queue in packets (max_queue_size)")
+    parser.add_argument("--listen", default="127.0.0.1")
+    parser.add_argument("--port-a", type=int, default=4501)
+    parser.add_argument("--port-b", type=int, default=4502)
+    parser.add_argument("--server", default="127.0.0.1:4443")
+
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
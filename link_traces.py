@@ -0,0 +1,123 @@
+"""
+Link condition timelines shared by mpquic_topo.py (Mininet) and
+link_emulator.py (userspace).
+
+Two kinds of timeline are supported:
+
+Link events - scripted up/down, one per line:
+    <seconds> <path> <up|down>
+
+Link traces - time-varying bandwidth / delay / loss, in either format:
+    CSV:       time_s,bw_mbps,delay_ms,loss_pct   (header optional, empty = unchanged)
+    Mahimahi:  one millisecond timestamp per line, each a 1500-byte delivery
+               opportunity (the standard cellular trace format). Converted to
+               bandwidth per TRACE_BIN seconds; delay and loss are left unchanged.
+
+Trace values have the same meaning as the bw/delay/loss arguments of the
+TCLinks in mpquic_topo.py, i.e. they apply to each of the two links on a path.
+"""
+import json
+import os
+
+PATHS = ("A", "B")
+
+MAHIMAHI_PACKET_BYTES = 1500
+TRACE_BIN = 1.0  # seconds per bandwidth sample when converting Mahimahi traces
+
+LINK_EVENT_LOG = os.path.join("runs", "link_events.json")
+LINK_TRACE_LOG = os.path.join("runs", "link_trace.json")
+
+
+def _lines(path):
+    """Yield (lineno, line) for non-empty lines with '#' comments stripped."""
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if line:
+                yield lineno, line
+
+
+def load_link_events(path):
+    """
+    Parse a link event script into sorted (seconds, path, state) tuples.
+
+    Times are relative to when the script is started.
+    """
+    events = []
+    for lineno, line in _lines(path):
+        try:
+            t, path_name, state = line.split()
+            t = float(t)
+        except ValueError:
+            raise ValueError(f"{path}:{lineno}: expected '<seconds> <path> <up|down>'")
+        if path_name not in PATHS or state not in ("up", "down"):
+            raise ValueError(f"{path}:{lineno}: unknown path or state in '{line}'")
+        events.append((t, path_name, state))
+    return sorted(events)
+
+
+def _load_csv_trace(path, lines):
+    rows = []
+    for lineno, line in lines:
+        fields = [f.strip() for f in line.split(",")]
+        if lineno == lines[0][0] and not fields[0].replace(".", "", 1).isdigit():
+            continue  # header
+        if len(fields) != 4:
+            raise ValueError(f"{path}:{lineno}: expected 'time_s,bw_mbps,delay_ms,loss_pct'")
+        try:
+            t, bw, delay, loss = [float(f) if f else None for f in fields]
+        except ValueError:
+            raise ValueError(f"{path}:{lineno}: non-numeric field in '{line}'")
+        if t is None:
+            raise ValueError(f"{path}:{lineno}: missing time")
+        rows.append((t, bw, delay, loss))
+    return sorted(rows, key=lambda r: r[0])
+
+
+def _load_mahimahi_trace(path, lines):
+    stamps = []
+    for lineno, line in lines:
+        try:
+            stamps.append(int(line) / 1000.0)
+        except ValueError:
+            raise ValueError(f"{path}:{lineno}: expected a millisecond timestamp")
+
+    bins = [0] * (int(max(stamps) // TRACE_BIN) + 1)
+    for t in stamps:
+        bins[int(t // TRACE_BIN)] += 1
+
+    return [
+        (i * TRACE_BIN, n * MAHIMAHI_PACKET_BYTES * 8 / TRACE_BIN / 1e6, None, None)
+        for i, n in enumerate(bins)
+    ]
+
+
+def load_trace(path):
+    """
+    Parse a link trace into sorted (seconds, bw_mbps, delay_ms, loss_pct) rows.
+
+    None means "leave unchanged". The format is detected from the first line.
+    """
+    lines = list(_lines(path))
+    if not lines:
+        raise ValueError(f"{path}: empty trace")
+    if "," in lines[0][1]:
+        return _load_csv_trace(path, lines)
+    return _load_mahimahi_trace(path, lines)
+
+
+def trace_duration(trace):
+    return trace[-1][0] if trace else 0.0
+
+
+def append_timeline(log_path, entries):
+    """Append timeline entries to a shared JSON log so runs can be correlated later."""
+    if not entries:
+        return
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    history = []
+    if os.path.exists(log_path):
+        with open(log_path) as f:
+            history = json.load(f)
+    with open(log_path, "w") as f:
+        json.dump(history + entries, f, indent=2)
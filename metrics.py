@@ -0,0 +1,185 @@
+"""
+Low-overhead live metrics for the client and server.
+
+Counters and histograms are plain Python numbers bumped in place from the
+asyncio loop. Everything runs on that one thread, so updates need no locks and
+cost a few attribute operations. Gauges can instead be bound to a function that
+is only evaluated when the metrics are read, which keeps expensive values (e.g.
+jitter over the whole RTT history) out of the hot path entirely.
+
+Metrics are exported either over a local HTTP endpoint in Prometheus text
+format, or as periodic JSON-lines snapshots to a file.
+"""
+import asyncio
+import bisect
+import json
+import time
+
+# Bucket upper bounds (seconds) for RTT / latency histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+
+class Gauge:
+    __slots__ = ("value", "fn")
+
+    def __init__(self):
+        self.value = 0.0
+        self.fn = None
+
+    def set(self, v):
+        self.value = v
+
+    def set_function(self, fn):
+        """Compute the value lazily, only when metrics are read."""
+        self.fn = fn
+
+    def get(self):
+        return self.fn() if self.fn is not None else self.value
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v):
+        self.counts[bisect.bisect_left(self.bounds, v)] += 1
+        self.sum += v
+        self.count += 1
+
+
+class Family:
+    """A named metric with one child per label set."""
+
+    def __init__(self, kind, name, help_text, labelnames, make):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.make = make
+        self.children = {}
+
+    def labels(self, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = self.make()
+        return child
+
+
+class Registry:
+    def __init__(self):
+        self.families = []
+
+    def _add(self, kind, name, help_text, labelnames, make):
+        family = Family(kind, name, help_text, tuple(labelnames), make)
+        self.families.append(family)
+        return family
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add("counter", name, help_text, labelnames, Counter)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._add("gauge", name, help_text, labelnames, Gauge)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add("histogram", name, help_text, labelnames, lambda: Histogram(buckets))
+
+    def render(self):
+        """Prometheus text exposition format."""
+        lines = []
+        for f in self.families:
+            lines.append(f"# HELP {f.name} {f.help}")
+            lines.append(f"# TYPE {f.name} {f.kind}")
+            for key, child in f.children.items():
+                labels = [f'{n}="{v}"' for n, v in zip(f.labelnames, key)]
+                if f.kind == "histogram":
+                    cumulative = 0
+                    for bound, n in zip(list(child.bounds) + ["+Inf"], child.counts):
+                        cumulative += n
+                        le = ",".join(labels + [f'le="{bound}"'])
+                        lines.append(f"{f.name}_bucket{{{le}}} {cumulative}")
+                    suffix = "{" + ",".join(labels) + "}" if labels else ""
+                    lines.append(f"{f.name}_sum{suffix} {child.sum}")
+                    lines.append(f"{f.name}_count{suffix} {child.count}")
+                else:
+                    suffix = "{" + ",".join(labels) + "}" if labels else ""
+                    value = child.get() if f.kind == "gauge" else child.value
+                    lines.append(f"{f.name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Plain dict of every metric, for JSON snapshots."""
+        out = {"time": time.time()}
+        for f in self.families:
+            values = {}
+            for key, child in f.children.items():
+                label = ",".join(f"{n}={v}" for n, v in zip(f.labelnames, key)) or "_"
+                if f.kind == "histogram":
+                    values[label] = {
+                        "buckets": dict(zip([str(b) for b in child.bounds] + ["+Inf"], child.counts)),
+                        "sum": child.sum,
+                        "count": child.count,
+                    }
+                elif f.kind == "gauge":
+                    values[label] = child.get()
+                else:
+                    values[label] = child.value
+            out[f.name] = values
+        return out
+
+
+async def serve_http(registry, port, host="127.0.0.1"):
+    """Serve GET /metrics on a local port. Returns the asyncio server."""
+
+    async def handle(reader, writer):
+        try:
+            request = await reader.readline()
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass  # skip headers
+            parts = request.split()
+            if len(parts) >= 2 and parts[1] == b"/metrics":
+                body = registry.render().encode()
+                status = b"200 OK"
+            else:
+                body = b"not found\n"
+                status = b"404 Not Found"
+            writer.write(
+                b"HTTP/1.1 " + status + b"\r\n"
+                b"Content-Type: text/plain; version=0.0.4\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                b"Connection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"*** Metrics at http://{host}:{port}/metrics")
+    return server
+
+
+async def write_snapshots(registry, path, interval):
+    """Append a JSON snapshot of every metric to `path` every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        write_snapshot(registry, path)
+
+
+def write_snapshot(registry, path):
+    with open(path, "a") as f:
+        f.write(json.dumps(registry.snapshot()) + "\n")
@@ -13,6 +13,17 @@ from mininet.cli import CLI
 from mininet.node import Controller
 import os
 import sys
+import threading
+import time
+
+from link_traces import (
+    LINK_EVENT_LOG,
+    LINK_TRACE_LOG,
+    append_timeline,
+    load_link_events,
+    load_trace,
+    trace_duration,
+)
 
 
 class Topo1(Topo):
@@ -113,6 +124,125 @@ TOPOLOGIES = {
 # Keep backward compatibility
 MPTopo = Topo1
 
+# Switch carrying each path (see the Topo classes above)
+PATH_SWITCHES = {"A": "s1", "B": "s2"}
+
+
+def set_path_status(net, path_name, state):
+    """
+    Bring a path up or down by toggling the switch side of its h1 link.
+
+    The host interfaces are left alone so the per-path routing tables set up
+    by startup.sh survive the outage.
+    """
+    h1 = net.get("h1")
+    switch = net.get(PATH_SWITCHES[path_name])
+    for link in net.linksBetween(h1, switch):
+        intf = link.intf1 if link.intf1.node == switch else link.intf2
+        intf.ifconfig(state)
+
+
+def run_link_events(net, events):
+    """Apply scripted link events in real time, logging when each one fired."""
+    applied = []
+    start = time.time()
+    for t, path_name, state in events:
+        delay = start + t - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        set_path_status(net, path_name, state)
+        applied.append({"time": time.time(), "offset": t, "path": path_name, "state": state})
+        info(f"*** Link event: path {path_name} {state}\n")
+
+    append_timeline(LINK_EVENT_LOG, applied)
+
+
+def path_intfs(net, path_name):
+    """All TC interfaces on a path: both ends of h1<->switch and switch<->h2."""
+    switch = net.get(PATH_SWITCHES[path_name])
+    intfs = []
+    for host in net.get("h1", "h2"):
+        for link in net.linksBetween(host, switch):
+            intfs += [link.intf1, link.intf2]
+    return intfs
+
+
+def set_path_conditions(net, path_name, bw, delay, loss):
+    """
+    Reconfigure every link on a path. None keeps the current value, so
+    bandwidth-only traces inherit the topology's delay and loss.
+    """
+    for intf in path_intfs(net, path_name):
+        params = dict(intf.params)
+        if bw is not None:
+            params["bw"] = bw
+        if delay is not None:
+            params["delay"] = f"{delay}ms"
+        if loss is not None:
+            params["loss"] = loss
+        intf.params = params
+        intf.config(**params)
+
+
+def run_link_trace(net, path_name, trace, repeat=False):
+    """Replay a bandwidth/delay/loss trace on one path, logging each change."""
+    applied = []
+    start = time.time()
+    while True:
+        for t, bw, delay, loss in trace:
+            delay_s = start + t - time.time()
+            if delay_s > 0:
+                time.sleep(delay_s)
+            set_path_conditions(net, path_name, bw, delay, loss)
+            applied.append({
+                "time": time.time(),
+                "offset": time.time() - start,
+                "path": path_name,
+                "bw": bw,
+                "delay": delay,
+                "loss": loss,
+            })
+        if not repeat:
+            break
+        # Mahimahi-style looping: restart the trace where it ended
+        start += trace_duration(trace) or 1.0
+
+    append_timeline(LINK_TRACE_LOG, applied)
+
+
+class MPQuicCLI(CLI):
+    """Mininet CLI with a command for scripted link up/down events."""
+
+    def do_linkevents(self, line):
+        """linkevents <file>: replay a link event script in the background."""
+        args = line.split()
+        if len(args) != 1:
+            print("Usage: linkevents <file>")
+            return
+        try:
+            events = load_link_events(args[0])
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return
+        threading.Thread(target=run_link_events, args=(self.mn, events), daemon=True).start()
+
+    def do_linktrace(self, line):
+        """linktrace <path> <file> [repeat]: replay a link trace on a path in the background."""
+        args = line.split()
+        if len(args) not in (2, 3) or args[0] not in PATH_SWITCHES or args[2:] not in ([], ["repeat"]):
+            print("Usage: linktrace <A|B> <file> [repeat]")
+            return
+        try:
+            trace = load_trace(args[1])
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return
+        threading.Thread(
+            target=run_link_trace,
+            args=(self.mn, args[0], trace, len(args) == 3),
+            daemon=True,
+        ).start()
+
 def run(topo_num=1):
     """Run Mininet with specified topology number"""
     
@@ -153,8 +283,10 @@ def run(topo_num=1):
     info(f"\n*** Topology {topo_num} ready - routing configured automatically\n")
     info("*** Run QUIC server on h2 and client on h1\n")
     info("*** Use 'source run_all_experiments.sh' to run all schedulers\n")
+    info("*** Use 'linkevents <file>' to script link up/down events\n")
+    info("*** Use 'linktrace <A|B> <file>' to replay a bandwidth/delay/loss trace\n")
 
-    CLI(net)
+    MPQuicCLI(net)
     net.stop()
 
 
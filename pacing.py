@@ -0,0 +1,96 @@
+"""
+Per-path token-bucket pacing for scheduler_client.py (--pacing).
+
+aioquic already spaces out a connection's packets at cwnd / sRTT, but it
+lets up to a quarter of the window (16 packets) out at once and charges
+every packet as full-sized. On a shallow bottleneck queue (Topology 1, path
+A: 20 packets) such bursts overflow the queue, and the resulting losses and
+queueing delay skew the RTT-based schedulers.
+
+TokenBucketPacer takes the place of aioquic's pacer on a connection
+(`install(quic, burst)`), so packets are still released from aioquic's own
+send loop and timer (loop.call_at), at
+
+    rate = gain * max(estimated bandwidth, cwnd / sRTT)
+
+with gain 2 in slow start (so the window can still double per RTT) and
+PACING_GAIN after it. Until the first RTT sample the rate comes from the
+initial window and the configured initial RTT, so chunks are not all handed
+over in the first round trip. The estimated bandwidth is the path's measured
+delivery rate, set by the client as it samples it. Tokens are bytes, charged
+with each packet's real size, and the bucket holds at most `burst` bytes.
+"""
+from aioquic import tls
+
+PACING_GAIN = 1.25      # rate multiplier in congestion avoidance
+SLOW_START_GAIN = 2.0   # rate multiplier in slow start
+DEFAULT_BURST = 2400    # bytes the bucket can hold (two full packets)
+
+APPLICATION_EPOCHS = (tls.Epoch.ZERO_RTT, tls.Epoch.ONE_RTT)
+
+
+class TokenBucketPacer:
+    """
+    Same interface as aioquic's QuicPacketPacer: the connection asks
+    next_send_time() before each application packet and calls
+    update_after_send() after it; recovery calls update_rate() on every RTT
+    sample and congestion event.
+    """
+
+    def __init__(self, loss, max_datagram_size, burst=DEFAULT_BURST):
+        self.loss = loss
+        self.max_datagram_size = max_datagram_size
+        self.burst = burst
+        self.bandwidth = 0.0    # measured delivery rate (bytes/s), set by the client
+        self.tokens = float(burst)
+        self.evaluation_time = 0.0
+        self.update_rate(loss._cc.congestion_window, loss._rtt_initial)
+
+    def refill(self, now):
+        if now > self.evaluation_time:
+            self.tokens = min(self.burst, self.tokens + (now - self.evaluation_time) * self.rate)
+            self.evaluation_time = now
+
+    def delay(self, now):
+        """Seconds until the bucket has tokens again (0 if it has some now)."""
+        self.refill(now)
+        return 0.0 if self.tokens > 0 else -self.tokens / self.rate
+
+    # ---- aioquic QuicPacketPacer interface ----
+
+    def next_send_time(self, now):
+        wait = self.delay(now)
+        return now + wait if wait else None
+
+    def update_after_send(self, now):
+        # the packet's size is not known yet: charge a full one, and
+        # on_packet_sent() refunds the difference
+        self.refill(now)
+        self.tokens -= self.max_datagram_size
+
+    def update_rate(self, congestion_window, smoothed_rtt):
+        cc = self.loss._cc
+        slow_start = cc.ssthresh is None or congestion_window < cc.ssthresh
+        gain = SLOW_START_GAIN if slow_start else PACING_GAIN
+        self.rate = gain * max(self.bandwidth, congestion_window / max(smoothed_rtt, 1e-6))  # bytes/s
+
+    def on_packet_sent(self, packet):
+        if packet.epoch in APPLICATION_EPOCHS:
+            # ACK-only packets are not in flight and cost nothing
+            self.tokens += self.max_datagram_size - (packet.sent_bytes if packet.in_flight else 0)
+
+
+def install(quic, burst=DEFAULT_BURST):
+    """Replace a QuicConnection's packet pacer with a TokenBucketPacer; returns it."""
+    loss = quic._loss
+    pacer = TokenBucketPacer(loss, quic._max_datagram_size, burst)
+    loss._pacer = pacer
+
+    on_packet_sent = loss.on_packet_sent
+
+    def paced_packet_sent(*, packet, space):
+        on_packet_sent(packet=packet, space=space)
+        pacer.on_packet_sent(packet)
+
+    loss.on_packet_sent = paced_packet_sent
+    return pacer
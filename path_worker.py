@@ -0,0 +1,325 @@
+"""
+Per-path worker processes for scheduler_client.py (--workers process).
+
+Each path's QuicConnection, its packet protection and its UDP socket live in
+a worker process with its own event loop, so the two paths and the scheduler
+use separate cores instead of sharing one.
+
+The scheduler talks to a worker over two shared-memory rings
+(ring_buffer.Channel):
+
+    commands  scheduler -> worker   D stream data, G datagram, P ping, S stop
+    updates   worker -> scheduler   R state after each received datagram,
+                                    L packets declared lost
+
+On the scheduler side, RemoteConnection stands in for the path's
+QuicConnectionProtocol. Its `_quic` mirrors the few aioquic internals the
+client reads (loss-recovery RTTs, cwnd, bytes in flight, the stream's ACKed
+offset, whether the peer accepted DATAGRAM frames, datagrams not sent yet,
+whether the handshake is done) from the worker's updates, so PathState and
+the schedulers run unchanged.
+"""
+import asyncio
+import multiprocessing
+import struct
+import time
+from collections import deque
+
+from aioquic import tls
+
+from ring_buffer import Channel
+
+STREAM_DATA = struct.Struct("!cQ")  # b"D", stream id, then the data
+DATAGRAM = b"G"                     # then the datagram
+PING = struct.Struct("!cQ")         # b"P", uid
+STOP = b"S"
+# b"R", latest RTT, smoothed RTT, RTT initialized, PTO, cwnd, ssthresh (-1 = none),
+# bytes in flight, data stream id (-1 = none yet), ACKed offset of that stream,
+# peer's max DATAGRAM frame size (-1 = not negotiated), datagrams queued unsent,
+# G commands handled so far, handshake complete, largest packet number ACKed (-1 = none)
+STATE = struct.Struct("!cdd?dQqQqQqIQ?q")
+LOSS = struct.Struct("!cIQq")       # b"L", packets, cwnd, ssthresh
+
+JOIN_TIMEOUT = 5.0  # seconds to wait for a worker to exit after STOP
+STOP_RETRY = 0.001  # seconds between attempts to queue STOP in a full ring
+
+
+# ---------------------------------------------------------------------------
+# Worker process
+# ---------------------------------------------------------------------------
+
+def run_worker(name, local_ip, server, cc, commands, updates):
+    """Process entry point: one path's QUIC connection on its own event loop."""
+    try:
+        asyncio.run(serve_path(name, local_ip, server, cc, commands, updates))
+    except KeyboardInterrupt:
+        pass
+
+
+async def serve_path(name, local_ip, server, cc, commands, updates):
+    # imported here: scheduler_client imports this module lazily itself
+    from scheduler_client import MPQuicProtocol, quic_connect
+
+    class WorkerProtocol(MPQuicProtocol):
+        def datagram_received(self, data, addr) -> None:
+            super().datagram_received(data, addr)
+            worker.publish_state()
+
+    conn = await quic_connect(local_ip, *server, cc=cc, protocol_class=WorkerProtocol)
+    worker = PathWorker(conn, updates)
+    commands.listen(asyncio.get_running_loop(), worker.on_command)
+    try:
+        await worker.stopped.wait()
+    finally:
+        asyncio.get_running_loop().remove_reader(commands.rx.fileno())
+        commands.close()
+        updates.close()
+
+
+class PathWorker:
+    def __init__(self, conn, updates):
+        self.conn = conn
+        self.quic = conn._quic
+        self.updates = updates
+        self.stream_id = -1
+        self.datagrams = 0
+        self.stopped = asyncio.Event()
+        self.transmit_scheduled = False
+
+        # report losses as they are declared, with the window after the cut
+        loss = self.quic._loss
+        on_packets_lost = loss._on_packets_lost
+
+        def reported_packets_lost(*, packets, **kwargs):
+            packets = list(packets)
+            on_packets_lost(packets=packets, **kwargs)
+            if packets and kwargs.get("congestion_event", True):
+                cc = loss._cc
+                self.send(LOSS.pack(b"L", len(packets), cc.congestion_window,
+                                    -1 if cc.ssthresh is None else cc.ssthresh))
+
+        loss._on_packets_lost = reported_packets_lost
+
+    def send(self, message):
+        # the scheduler drains updates on every wakeup, so a full ring only
+        # drops state that a later update supersedes
+        if self.updates.send(message):
+            self.updates.ring_doorbell()
+
+    def publish_state(self):
+        loss = self.quic._loss
+        cc = loss._cc
+        stream = self.quic._streams.get(self.stream_id)
+        self.send(STATE.pack(
+            b"R", loss._rtt_latest, loss._rtt_smoothed, loss._rtt_initialized,
+            loss.get_probe_timeout(), cc.congestion_window,
+            -1 if cc.ssthresh is None else cc.ssthresh, cc.bytes_in_flight,
+            self.stream_id, stream.sender._buffer_start if stream is not None else 0,
+            -1 if self.quic._remote_max_datagram_frame_size is None
+            else self.quic._remote_max_datagram_frame_size,
+            len(self.quic._datagrams_pending), self.datagrams, self.quic._handshake_complete,
+            self.quic._spaces[tls.Epoch.ONE_RTT].largest_acked_packet,
+        ))
+
+    def on_command(self, message):
+        kind = message[:1]
+        if kind == b"D":
+            _, sid = STREAM_DATA.unpack_from(message)
+            self.stream_id = sid
+            self.quic.send_stream_data(sid, message[STREAM_DATA.size:], end_stream=False)
+        elif kind == DATAGRAM:
+            self.datagrams += 1
+            self.quic.send_datagram_frame(message[1:])
+        elif kind == b"P":
+            _, uid = PING.unpack(message)
+            self.quic.send_ping(uid)
+        elif kind == STOP:
+            self.conn.close()
+            self.stopped.set()
+            return
+
+        # one transmit for everything drained in this wakeup
+        if not self.transmit_scheduled:
+            self.transmit_scheduled = True
+            asyncio.get_running_loop().call_soon(self.transmit)
+
+    def transmit(self):
+        self.transmit_scheduled = False
+        self.conn.transmit()
+
+
+# ---------------------------------------------------------------------------
+# Scheduler side
+# ---------------------------------------------------------------------------
+
+class RemoteCongestion:
+    def __init__(self):
+        self.congestion_window = 0
+        self.ssthresh = None
+        self.bytes_in_flight = 0
+
+
+class RemoteLoss:
+    """The loss-recovery fields the client reads, as last reported by the worker."""
+
+    def __init__(self):
+        self._rtt_latest = 0.0
+        self._rtt_smoothed = 0.0
+        self._rtt_initialized = False
+        self._pto = 1.0
+        self._cc = RemoteCongestion()
+
+    @property
+    def congestion_window(self):
+        return self._cc.congestion_window
+
+    @property
+    def bytes_in_flight(self):
+        return self._cc.bytes_in_flight
+
+    def get_probe_timeout(self):
+        return self._pto
+
+    def _on_packets_lost(self, *, packets, **kwargs):
+        pass  # PathState wraps this to count losses
+
+
+class RemoteStream:
+    """Stands in for an aioquic stream; only the ACKed offset is mirrored."""
+
+    def __init__(self):
+        self.sender = self
+        self._buffer_start = 0
+
+
+class RemoteDatagramQueue:
+    """
+    Stands in for aioquic's queue of unsent datagrams; only its length is
+    mirrored, counting datagrams still on their way to the worker.
+    """
+
+    def __init__(self):
+        self.queued = 0     # in the worker's QUIC queue, as last reported
+        self.forwarded = 0  # handed to the worker
+        self.handled = 0    # taken in by the worker, as last reported
+
+    def __len__(self):
+        return self.queued + self.forwarded - self.handled
+
+
+class RemoteQuic:
+    def __init__(self, conn):
+        self.conn = conn
+        self._loss = RemoteLoss()
+        self._streams = {}
+        self._next_stream_id = 0
+        self._remote_max_datagram_frame_size = None
+        self._datagrams_pending = RemoteDatagramQueue()
+        self._handshake_complete = False
+
+    def get_next_available_stream_id(self, is_unidirectional=False):
+        # client-initiated bidirectional streams, as aioquic numbers them
+        stream_id = self._next_stream_id
+        self._next_stream_id += 4
+        return stream_id
+
+    def send_stream_data(self, stream_id, data, end_stream=False):
+        self.conn.send(STREAM_DATA.pack(b"D", stream_id) + data)
+
+    def send_datagram_frame(self, data):
+        self._datagrams_pending.forwarded += 1
+        self.conn.send(DATAGRAM + data)
+
+    def send_ping(self, uid):
+        self.conn.send(PING.pack(b"P", uid))
+
+
+class RemoteConnection:
+    """Scheduler-side handle of a path worker, used where a protocol would be."""
+
+    def __init__(self, process, commands, updates):
+        self.process = process
+        self.commands = commands
+        self.updates = updates
+        self._quic = RemoteQuic(self)
+        self.path_state = None
+        self.pending = deque()  # commands waiting for ring space
+
+    def send(self, message):
+        if self.pending or not self.commands.send(message):
+            self.pending.append(message)
+
+    def flush(self):
+        sent = False
+        while self.pending and self.commands.send(self.pending[0]):
+            self.pending.popleft()
+            sent = True
+        return sent
+
+    def transmit(self):
+        """Wake the worker; it transmits everything queued since its last wakeup."""
+        self.flush()
+        self.commands.ring_doorbell()
+
+    def on_update(self, message):
+        kind = message[:1]
+        loss = self._quic._loss
+        if kind == b"R":
+            (_, loss._rtt_latest, loss._rtt_smoothed, loss._rtt_initialized, loss._pto,
+             loss._cc.congestion_window, ssthresh, loss._cc.bytes_in_flight,
+             stream_id, acked, max_datagram, datagrams_queued, datagrams_handled,
+             self._quic._handshake_complete, largest_acked) = STATE.unpack(message)
+            loss._cc.ssthresh = None if ssthresh < 0 else ssthresh
+            self._quic._remote_max_datagram_frame_size = None if max_datagram < 0 else max_datagram
+            self._quic._datagrams_pending.queued = datagrams_queued
+            self._quic._datagrams_pending.handled = datagrams_handled
+            if stream_id >= 0:
+                stream = self._quic._streams.get(stream_id)
+                if stream is None:
+                    stream = self._quic._streams[stream_id] = RemoteStream()
+                stream._buffer_start = acked
+
+            # ring space freed up as the worker drained its commands
+            if self.pending and self.flush():
+                self.commands.ring_doorbell()
+
+            # same hooks MPQuicProtocol runs for a datagram on an in-process path
+            if self.path_state is not None:
+                self.path_state.sample_rtt(largest_acked, loss._rtt_latest)
+                self.path_state.on_datagram_received()
+
+        elif kind == b"L":
+            _, packets, loss._cc.congestion_window, ssthresh = LOSS.unpack(message)
+            loss._cc.ssthresh = None if ssthresh < 0 else ssthresh
+            loss._on_packets_lost(packets=[None] * packets)
+
+    def close(self):
+        # STOP queues behind any commands still waiting for ring space; the
+        # worker frees space as the doorbell wakes it
+        self.send(STOP)
+        deadline = time.time() + JOIN_TIMEOUT
+        while self.pending and time.time() < deadline:
+            self.flush()
+            self.commands.ring_doorbell()
+            time.sleep(STOP_RETRY)
+        self.commands.ring_doorbell()
+        self.process.join(max(0.0, deadline - time.time()))
+        if self.process.is_alive():
+            self.process.terminate()
+        asyncio.get_running_loop().remove_reader(self.updates.rx.fileno())
+        self.commands.close(unlink=True)
+        self.updates.close(unlink=True)
+
+
+def start_path_worker(name, local_ip, server, cc):
+    """Start a worker connecting `local_ip` to `server`; returns its RemoteConnection."""
+    commands, updates = Channel(), Channel()
+    # spawn, not fork: the parent already has a running event loop
+    ctx = multiprocessing.get_context("spawn")
+    process = ctx.Process(target=run_worker, name=f"path-{name}", daemon=True,
+                          args=(name, local_ip, server, cc, commands, updates))
+    process.start()
+
+    conn = RemoteConnection(process, commands, updates)
+    updates.listen(asyncio.get_running_loop(), conn.on_update)
+    return conn
@@ -0,0 +1,197 @@
+"""
+Hot-path profiling for the client send loop and the server event handler.
+
+All of it is off by default:
+
+    PhaseTimer     monotonic-ns laps between points in a hot loop, aggregated
+                   per phase into a histogram of the metrics registry (so they
+                   are also on /metrics and in snapshots). Disabled, a lap is a
+                   function call and one truth test.
+    LoopLagMonitor how late the asyncio loop wakes a periodic sleeper, i.e. how
+                   long callbacks hold the loop.
+    Profiler       cProfile, or a sampling profiler that records the main
+                   thread's stack every few ms into collapsed-stack format
+                   (flamegraph.pl, speedscope).
+"""
+import asyncio
+import cProfile
+import collections
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+
+# Bucket upper bounds (seconds) for per-phase times: 1us .. 10ms
+PHASE_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 1e-2)
+# Bucket upper bounds (seconds) for event-loop lag: 100us .. 1s
+LAG_BUCKETS = (1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 1.0)
+
+LAG_INTERVAL = 0.005     # seconds between loop-lag probes
+SAMPLE_INTERVAL = 0.001  # seconds between stack samples
+PROFILERS = ["cprofile", "sample"]
+
+
+def bucket_quantile(hist, q):
+    """Upper bound of the histogram bucket holding quantile q (inf if past the last bound)."""
+    if not hist.count:
+        return 0.0
+    target = q * hist.count
+    seen = 0
+    for bound, n in zip(hist.bounds, hist.counts):
+        seen += n
+        if seen >= target:
+            return bound
+    return float("inf")
+
+
+def summarize(hist):
+    return {
+        "count": hist.count,
+        "total_s": hist.sum,
+        "mean_us": hist.sum / hist.count * 1e6 if hist.count else 0.0,
+        "p50_us_le": bucket_quantile(hist, 0.5) * 1e6,
+        "p99_us_le": bucket_quantile(hist, 0.99) * 1e6,
+    }
+
+
+class PhaseTimer:
+    """
+    Splits a hot loop's time into named phases:
+
+        t = PHASES.start()
+        ...
+        t = PHASES.lap("schedule", t)   # time since t goes to "schedule"
+        ...
+        t = PHASES.lap("send", t)
+
+    start() returns 0 while disabled, and lap() passes the 0 straight through.
+    Phases may nest: a phase timed around a callback (e.g. datagram_received)
+    includes the phases timed inside it.
+    """
+
+    def __init__(self, registry, name, help_text):
+        self.enabled = False
+        self.family = registry.histogram(name, help_text, ["phase"], buckets=PHASE_BUCKETS)
+        self.phases = {}
+
+    def start(self):
+        return time.monotonic_ns() if self.enabled else 0
+
+    def lap(self, phase, t0):
+        """Charge the time since t0 to `phase`; return now, the start of the next phase."""
+        if not t0:
+            return 0
+        now = time.monotonic_ns()
+        hist = self.phases.get(phase)
+        if hist is None:
+            hist = self.phases[phase] = self.family.labels(phase=phase)
+        hist.observe((now - t0) / 1e9)
+        return now
+
+    def summary(self):
+        return {phase: summarize(hist) for phase, hist in self.phases.items()}
+
+
+class LoopLagMonitor:
+    """Periodically sleeps on the loop and records how late it wakes up."""
+
+    def __init__(self, registry, name, help_text):
+        self.hist = registry.histogram(name, help_text, buckets=LAG_BUCKETS).labels()
+        self.max = 0.0
+
+    async def run(self, interval=LAG_INTERVAL):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - expected)
+            self.hist.observe(lag)
+            self.max = max(self.max, lag)
+
+    def summary(self):
+        return {**summarize(self.hist), "max_us": self.max * 1e6}
+
+
+def print_summary(title, phases, lag=None):
+    """Print phase times, largest total first, and the loop lag if monitored."""
+    print(f"*** {title} (shares count nested phases in their parents too)")
+    total = sum(s["total_s"] for s in phases.values()) or 1.0
+    for phase, s in sorted(phases.items(), key=lambda kv: -kv[1]["total_s"]):
+        print(f"    {phase:18s} n={s['count']:8d} total={s['total_s'] * 1e3:9.1f}ms "
+              f"({s['total_s'] / total:5.1%}) mean={s['mean_us']:8.1f}us "
+              f"p50<={s['p50_us_le']:g}us p99<={s['p99_us_le']:g}us")
+    if lag is not None:
+        print(f"    loop lag           n={lag['count']:8d} mean={lag['mean_us']:.1f}us "
+              f"p99<={lag['p99_us_le']:g}us max={lag['max_us']:.1f}us")
+
+
+def write_summary(path, phases, lag=None):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"phases": phases, "loop_lag": lag}, f, indent=2)
+    print(f"*** Wrote {path}")
+
+
+class Profiler:
+    """cProfile or a stack sampler around part of a run; stop() saves the output."""
+
+    def __init__(self, mode, interval=SAMPLE_INTERVAL):
+        self.mode = mode
+        self.interval = interval
+        self.profile = None
+        self.samples = collections.Counter()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.mode == "cprofile":
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        else:
+            self.running = True
+            target = threading.get_ident()
+            self.thread = threading.Thread(target=self._sample, args=(target,), daemon=True)
+            self.thread.start()
+
+    def _sample(self, target):
+        while self.running:
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self, base):
+        """Stop profiling and write `base`.pstats or `base`.folded; return the path."""
+        os.makedirs(os.path.dirname(base) or ".", exist_ok=True)
+        if self.mode == "cprofile":
+            self.profile.disable()
+            path = base + ".pstats"
+            self.profile.dump_stats(path)
+            pstats.Stats(path).sort_stats("tottime").print_stats(15)
+        else:
+            self.running = False
+            self.thread.join()
+            path = base + ".folded"
+            with open(path, "w") as f:
+                for stack, n in self.samples.most_common():
+                    f.write(f"{stack} {n}\n")
+            self._print_top()
+        print(f"*** Wrote {path}")
+        return path
+
+    def _print_top(self, n=15):
+        """Functions with the most samples at the top of the stack."""
+        leaf = collections.Counter()
+        for stack, count in self.samples.items():
+            leaf[stack.rsplit(";", 1)[-1]] += count
+        total = sum(leaf.values()) or 1
+        print(f"*** {total} samples, top functions by self time:")
+        for fn, count in leaf.most_common(n):
+            print(f"    {count / total:6.1%} {fn}")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+QoE of every --abr run under a runs directory (default: runs).
+
+Replays each run's segment plan (segments.json) against the times its chunks
+reached the receiver (server_log.json, or receive_log.json for downloads)
+through abr.PlayoutBuffer, writes qoe.json next to them and prints one line
+per scheduler run:
+
+    python3 qoe.py            # runs/<sched>/ and runs/download/<sched>/
+    python3 qoe.py runs_top4
+"""
+import argparse
+import json
+import os
+
+from abr import evaluate
+
+
+def run_dirs(runs_dir):
+    """(direction, scheduler, log dir, receiver log) of every run with a segment plan."""
+    for direction, base, log_name in (("upload", runs_dir, "server_log.json"),
+                                      ("download", os.path.join(runs_dir, "download"),
+                                       "receive_log.json")):
+        if not os.path.isdir(base):
+            continue
+        for sched in sorted(os.listdir(base)):
+            log_dir = os.path.join(base, sched)
+            if os.path.exists(os.path.join(log_dir, "segments.json")):
+                yield direction, sched, log_dir, os.path.join(log_dir, log_name)
+
+
+def main(runs_dir):
+    found = False
+    for direction, sched, log_dir, log_path in run_dirs(runs_dir):
+        if not os.path.exists(log_path):
+            print(f"Missing {log_path}, skipping")
+            continue
+        found = True
+        with open(os.path.join(log_dir, "segments.json")) as f:
+            segments = json.load(f)
+        with open(log_path) as f:
+            receive_log = json.load(f)
+
+        qoe = {"abr": segments["abr"], **evaluate(segments["plan"], receive_log)}
+        with open(os.path.join(log_dir, "qoe.json"), "w") as f:
+            json.dump(qoe, f, indent=2)
+
+        print(f"{direction:8s} {sched:10s} abr={qoe['abr']:10s} qoe={qoe['qoe']:6.2f} "
+              f"bitrate={qoe['bitrate_mean']:6.0f}kbps startup={qoe['startup_delay']:.2f}s "
+              f"rebuffers={qoe['rebuffers']} stall={qoe['stall_time']:.2f}s "
+              f"switches={qoe['switches']} missing={qoe['missing_segments']}")
+    if not found:
+        print(f"No --abr runs under {runs_dir}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="QoE of every --abr run")
+    parser.add_argument("runs_dir", nargs="?", default="runs")
+    main(parser.parse_args().runs_dir)
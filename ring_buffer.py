@@ -0,0 +1,145 @@
+"""
+Single-producer / single-consumer message ring in shared memory.
+
+Used to pass chunks and path state between the scheduler process and the
+per-path worker processes (path_worker.py) without pickling or locks:
+
+    [head u64][tail u64][data ...]
+
+The producer only writes `head`, the consumer only writes `tail`; both are
+byte offsets that grow forever and are taken modulo the capacity. Each
+message is a u32 length followed by its bytes and may wrap around the end
+of the data area. The producer fills in the message before publishing the
+new head, and x86 keeps stores in order, so a consumer that sees the head
+also sees the message.
+
+Python has no memory barriers, so on CPUs with weaker ordering (ARM, POWER,
+RISC-V) a consumer could see the new head before the message bytes, or the
+producer could see a tail before the consumer has finished reading. Rings
+are therefore only created on x86 (`supported()`), and anything else raises.
+
+A ring is polled, so a Channel pairs it with a socketpair "doorbell": the
+producer writes a byte after publishing, and the consumer's event loop wakes
+on the socket and drains everything in the ring at once.
+"""
+import platform
+import socket
+import struct
+from multiprocessing import shared_memory
+
+OFFSETS = struct.Struct("QQ")
+LENGTH = struct.Struct("I")
+DEFAULT_CAPACITY = 1 << 22  # bytes of message data per ring
+# platform.machine() of CPUs that keep stores in order (x86 TSO)
+ORDERED_MACHINES = {"x86_64", "amd64", "i386", "i686", "x86"}
+
+
+def supported():
+    """Whether this CPU keeps stores in order, as the ring needs without barriers."""
+    return platform.machine().lower() in ORDERED_MACHINES
+
+
+class RingBuffer:
+    def __init__(self, name=None, capacity=DEFAULT_CAPACITY):
+        if not supported():
+            raise RuntimeError(f"shared-memory rings need x86 store ordering, not {platform.machine()}")
+        self.capacity = capacity
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=OFFSETS.size + capacity)
+            OFFSETS.pack_into(self.shm.buf, 0, 0, 0)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.buf = self.shm.buf
+        self.data = self.buf[OFFSETS.size:OFFSETS.size + capacity]
+
+    def __reduce__(self):
+        # pickled into a worker process: attach to the same segment
+        return RingBuffer, (self.shm.name, self.capacity)
+
+    def _copy_in(self, pos, data):
+        pos %= self.capacity
+        first = min(len(data), self.capacity - pos)
+        self.data[pos:pos + first] = data[:first]
+        if first < len(data):
+            self.data[:len(data) - first] = data[first:]
+
+    def _copy_out(self, pos, n):
+        pos %= self.capacity
+        first = min(n, self.capacity - pos)
+        if first == n:
+            return bytes(self.data[pos:pos + n])
+        return bytes(self.data[pos:]) + bytes(self.data[:n - first])
+
+    def put(self, message):
+        """Append one message; returns False (and writes nothing) if the ring is full."""
+        head, tail = OFFSETS.unpack_from(self.buf, 0)
+        needed = LENGTH.size + len(message)
+        if needed > self.capacity - (head - tail):
+            return False
+        self._copy_in(head, LENGTH.pack(len(message)))
+        self._copy_in(head + LENGTH.size, message)
+        struct.pack_into("Q", self.buf, 0, head + needed)  # publish
+        return True
+
+    def get(self):
+        """Pop the oldest message, or None if the ring is empty."""
+        head, tail = OFFSETS.unpack_from(self.buf, 0)
+        if head == tail:
+            return None
+        n, = LENGTH.unpack(self._copy_out(tail, LENGTH.size))
+        message = self._copy_out(tail + LENGTH.size, n)
+        struct.pack_into("Q", self.buf, 8, tail + LENGTH.size + n)
+        return message
+
+    def close(self, unlink=False):
+        self.data.release()
+        self.buf = None
+        self.data = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class Channel:
+    """A ring plus doorbell; one process sends, the other receives."""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.ring = RingBuffer(capacity=capacity)
+        self.rx, self.tx = socket.socketpair()
+        for sock in (self.rx, self.tx):
+            sock.setblocking(False)
+
+    def send(self, message):
+        """Queue a message without waking the receiver; False if the ring is full."""
+        return self.ring.put(message)
+
+    def ring_doorbell(self):
+        try:
+            self.tx.send(b"\0")
+        except BlockingIOError:
+            pass  # doorbell already full of unread wakeups
+
+    def listen(self, loop, callback):
+        """Call callback(message) for every message, from the receiver's event loop."""
+
+        def drain():
+            try:
+                while True:
+                    if not self.rx.recv(65536):
+                        loop.remove_reader(self.rx.fileno())  # sender gone
+                        break
+            except BlockingIOError:
+                pass
+            while True:
+                message = self.ring.get()
+                if message is None:
+                    break
+                callback(message)
+
+        loop.add_reader(self.rx.fileno(), drain)
+        drain()
+
+    def close(self, unlink=False):
+        self.rx.close()
+        self.tx.close()
+        self.ring.close(unlink)
@@ -10,4 +10,5 @@ h1 sleep 2
 h1 python3 scheduler_client.py redundant
 h1 sleep 2
 h1 python3 scheduler_client.py predict
-
+h1 sleep 2
+h1 python3 scheduler_client.py ecf
@@ -0,0 +1,19 @@
+# Mininet CLI commands to run all QUIC schedulers through a path A outage
+# Usage in Mininet CLI: source run_failover_experiments.sh
+
+h2 python3 server.py &
+h1 sleep 3
+linkevents link_events/path_a_outage.txt
+h1 python3 scheduler_client.py minrtt
+h1 sleep 6
+linkevents link_events/path_a_outage.txt
+h1 python3 scheduler_client.py wrr
+h1 sleep 6
+linkevents link_events/path_a_outage.txt
+h1 python3 scheduler_client.py redundant
+h1 sleep 6
+linkevents link_events/path_a_outage.txt
+h1 python3 scheduler_client.py predict
+h1 sleep 6
+linkevents link_events/path_a_outage.txt
+h1 python3 scheduler_client.py ecf
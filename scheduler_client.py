@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 import time
 import json
@@ -5,22 +6,62 @@ import random
 import socket
 import os
 import sys
+from collections import deque
 
+from aioquic import tls
 from aioquic.quic.configuration import QuicConfiguration
 from aioquic.quic.connection import QuicConnection
 from aioquic.asyncio.protocol import QuicConnectionProtocol
-from aioquic.quic.events import QuicEvent  # for type hinting in protocol
+from aioquic.quic.events import DatagramFrameReceived, QuicEvent, StreamDataReceived
+
+from abr import ABR_ALGORITHMS, DEFAULT_SEGMENTS, AbrSession
+from coupled_cc import COUPLED_ALGORITHMS, install as install_coupled_cc
+from framing import (
+    CHUNK_HEADER, MAX_DATAGRAM_CHUNK, MAX_DATAGRAM_FRAME_SIZE, ChunkReader, make_chunk, make_header,
+    make_request, parse_datagram,
+)
+from metrics import Registry, serve_http, write_snapshot, write_snapshots
+from pacing import DEFAULT_BURST, install as install_pacer
+from streams import DEFAULT_DURATION, DEFAULT_STREAMS, by_priority, next_due, parse_streams, served
+from profiling import (
+    PROFILERS, SAMPLE_INTERVAL, LoopLagMonitor, PhaseTimer, Profiler, print_summary, write_summary,
+)
+from ring_buffer import supported as rings_supported
 
 
 LOG = []
+PATH_EVENTS = []
 SEQ = 0
+VERBOSE = False
 
 # Schedulers
 SCHED_MIN_RTT = "minrtt"
 SCHED_WRR = "wrr"
 SCHED_REDUNDANT = "redundant"
 SCHED_PREDICT = "predict"
-VALID_SCHEDULERS = [SCHED_MIN_RTT, SCHED_WRR, SCHED_REDUNDANT, SCHED_PREDICT]
+SCHED_ECF = "ecf"
+VALID_SCHEDULERS = [SCHED_MIN_RTT, SCHED_WRR, SCHED_REDUNDANT, SCHED_PREDICT, SCHED_ECF]
+
+# Congestion control: aioquic's per-path controllers, or one coupled across paths
+VALID_CC = ["reno", "cubic"] + list(COUPLED_ALGORITHMS)
+
+# Delivery of each chunk: reliable stream, unreliable QUIC DATAGRAM, or
+# chosen per chunk by choose_delivery()
+DELIVERY_STREAM = "stream"
+DELIVERY_DATAGRAM = "datagram"
+DELIVERY_AUTO = "auto"
+VALID_DELIVERY = [DELIVERY_STREAM, DELIVERY_DATAGRAM, DELIVERY_AUTO]
+
+# Upload: the client schedules chunks to the server. Download: it requests
+# them, and server.py schedules them back over its own connections
+DIRECTION_UPLOAD = "upload"
+DIRECTION_DOWNLOAD = "download"
+VALID_DIRECTIONS = [DIRECTION_UPLOAD, DIRECTION_DOWNLOAD]
+
+# auto: a chunk that would arrive later than this over the stream is sent as
+# a datagram instead; so is every chunk on a path that lost packets recently
+DATAGRAM_DEADLINE = 0.2     # seconds
+LOSS_MEMORY = 1.0           # seconds a loss keeps a path on datagrams
 
 # Prediction weights
 alpha = 0.5
@@ -29,14 +70,90 @@ gamma = 1.2
 
 BASE_WEIGHT = 100_000
 
+# ECF: only move off the fastest path when the other one finishes this much sooner
+ECF_HYSTERESIS = 0.25
+
+# Path liveness states
+PATH_ACTIVE = "active"      # ACKs arriving normally
+PATH_SUSPECT = "suspect"    # ACK silence > SUSPECT_PTOS * PTO, PING sent
+PATH_FAILED = "failed"      # ACK silence > FAIL_PTOS * PTO, chunks rescheduled
+PATH_PROBING = "probing"    # failed path being re-probed with PINGs
+
+# Liveness thresholds, in multiples of the path's probe timeout (RTO)
+SUSPECT_PTOS = 1
+FAIL_PTOS = 3
+
+LIVENESS_INTERVAL = 0.01    # seconds between liveness checks
+PROBE_INTERVAL = 0.25       # seconds between PINGs on a failed path
+DRAIN_TIMEOUT = 30.0        # max seconds without ACK progress while draining at the end
+HANDSHAKE_TIMEOUT = 10.0    # max seconds to wait for every path's handshake and first RTT
+
+# Chunks pulled off failed paths, waiting to be resent on a surviving one
+RESEND = deque()
+
+# Set whenever a packet arrives on any path, for schedulers that wait for ACKs
+ACKED = None
+
+RATE_INTERVAL = 0.1         # seconds between delivery-rate samples
+
+# Errors raised in event loop callbacks (protocol handlers, call_later),
+# which asyncio only logs; any of them makes the client exit non-zero
+LOOP_ERRORS = []
+
+# Live metrics (see metrics.py); counters are bumped in the send / receive path,
+# gauges are computed from PathState only when scraped
+METRICS = Registry()
+CHUNKS_SCHEDULED = METRICS.counter(
+    "mpquic_client_chunks_scheduled_total", "Chunks scheduled onto a path", ["path"])
+CHUNKS_RESENT = METRICS.counter(
+    "mpquic_client_chunks_resent_total", "Chunks rescheduled onto a path after a failover", ["path"])
+PACKETS_LOST = METRICS.counter(
+    "mpquic_client_packets_lost_total", "Packets declared lost (and retransmitted) by QUIC", ["path"])
+DATAGRAMS_SENT = METRICS.counter(
+    "mpquic_client_datagrams_sent_total", "Chunks sent as unreliable DATAGRAM frames", ["path"])
+RTT_SAMPLES = METRICS.histogram(
+    "mpquic_client_rtt_seconds", "RTT samples", ["path"])
+PATH_GAUGES = {
+    "mpquic_client_srtt_seconds": ("Smoothed RTT", lambda p: p.rtt),
+    "mpquic_client_jitter_seconds": ("Mean RTT variation", lambda p: p.jitter),
+    "mpquic_client_send_rate_bytes": ("Send rate (bytes/s)", lambda p: p.bw),
+    "mpquic_client_delivery_rate_bytes": ("ACKed bytes per second", lambda p: p.delivery_rate),
+    "mpquic_client_cwnd_bytes": ("Congestion window", lambda p: p.conn._quic._loss.congestion_window),
+    "mpquic_client_bytes_in_flight": ("Bytes in flight", lambda p: p.conn._quic._loss.bytes_in_flight),
+    "mpquic_client_path_usable": ("1 if the path is active or suspect", lambda p: int(p.usable)),
+    "mpquic_client_pacing_rate_bytes": ("Pacing rate (bytes/s), 0 if not paced",
+                                        lambda p: p.pacer.rate if p.pacer else 0.0),
+}
+PATH_GAUGE_FAMILIES = {
+    name: (METRICS.gauge(name, help_text, ["path"]), fn)
+    for name, (help_text, fn) in PATH_GAUGES.items()
+}
+
+# Hot-path profiling (see profiling.py), off unless enabled on the command line
+PHASES = PhaseTimer(METRICS, "mpquic_client_phase_seconds", "Time per send-loop phase")
+LOOP_LAG = LoopLagMonitor(METRICS, "mpquic_client_loop_lag_seconds",
+                          "How late the event loop wakes a periodic sleeper")
+
+
 class PathState:
     def __init__(self, name, conn, stream_id):
         self.name = name
         self.conn = conn          # QuicConnectionProtocol
         self.stream = stream_id
 
-        # RTT / jitter history
+        # QUIC streams on this path, one per logical stream (streams.py) in the
+        # same order on every path, and the bytes written to each so far.
+        # The totals over all streams are kept as they change, since the
+        # schedulers read them for every chunk
+        self.stream_ids = [stream_id]
+        self.offsets = [0]
+        self.written = 0
+        self.acked_offset = 0  # bytes ACKed in order, refreshed as ACKs arrive
+
+        # RTT / jitter history, and the largest packet number the peer had
+        # ACKed at the last sample
         self.rtts = []
+        self.largest_acked = -1
 
         # sequence number of last chunk sent on this path
         self.last_seq = -1
@@ -50,6 +167,62 @@ class PathState:
         self.weight = 1
         self.current_weight = 0
 
+        # Liveness tracking
+        self.state = PATH_ACTIVE
+        self.last_rx_time = time.time()
+        self.last_probe_time = 0.0
+        self.silent_since = None
+
+        # chunks not yet acknowledged, in send order, as
+        # (seq, stream slot, end_offset, send_time, chunk)
+        self.inflight = deque()
+
+        # datagrams are never resent, so only remember when the oldest one
+        # not yet ACKed or declared lost went out (liveness, draining)
+        self.datagram_since = None
+        self.datagram_size = 0
+        self.last_loss_time = None
+
+        # delivery rate from ACKed stream bytes, sampled every RATE_INTERVAL
+        self.delivery_rate = 0.0
+        self.rate_mark = (time.time(), 0)
+
+        # token-bucket pacer (pacing.py) when running with --pacing
+        self.pacer = None
+
+        # metric children cached so the hot path skips label lookups
+        self.m_scheduled = CHUNKS_SCHEDULED.labels(path=name)
+        self.m_resent = CHUNKS_RESENT.labels(path=name)
+        self.m_lost = PACKETS_LOST.labels(path=name)
+        self.m_rtt = RTT_SAMPLES.labels(path=name)
+        self.m_datagrams = DATAGRAMS_SENT.labels(path=name)
+        for family, fn in PATH_GAUGE_FAMILIES.values():
+            family.labels(path=name).set_function(lambda fn=fn: fn(self))
+
+        # count packets QUIC declares lost; each one gets retransmitted. PTO
+        # probes and discarded handshake spaces also come through here, with
+        # congestion_event=False: those are not losses
+        loss = conn._quic._loss
+        on_packets_lost = loss._on_packets_lost
+
+        def counted_packets_lost(*, packets, **kwargs):
+            packets = list(packets)
+            on_packets_lost(packets=packets, **kwargs)
+            if not packets or not kwargs.get("congestion_event", True):
+                return
+            self.m_lost.inc(len(packets))
+            self.last_loss_time = time.time()
+            PATH_EVENTS.append({
+                "time": time.time(),
+                "path": self.name,
+                "event": "loss",
+                "packets": len(packets),
+                "cwnd": loss._cc.congestion_window,
+                "ssthresh": loss._cc.ssthresh,
+            })
+
+        loss._on_packets_lost = counted_packets_lost
+
     @property
     def rtt(self):
         """Smoothed RTT: mean of logged samples, default 30ms if none yet."""
@@ -81,9 +254,193 @@ class PathState:
 
         return max(1.0, self.bytes_sent / dt)  # bytes / second
 
+    @property
+    def srtt(self):
+        """Loss-recovery smoothed RTT (EWMA), falling back to the sample mean."""
+        loss = self.conn._quic._loss
+        return loss._rtt_smoothed if loss._rtt_initialized else self.rtt
+
+    @property
+    def unacked(self):
+        """
+        Bytes written to the stream and not yet ACKed (in flight or still
+        queued), plus datagrams QUIC has queued but not sent yet.
+        """
+        queued = len(self.conn._quic._datagrams_pending) * self.datagram_size
+        return self.written - self.acked_offset + queued
+
+    @property
+    def unsent(self):
+        """
+        Bytes handed to QUIC that it has not sent even once yet (held back
+        by the congestion window, the pacer or the handshake).
+        """
+        quic = self.conn._quic
+        sent = 0
+        for sid in self.stream_ids:
+            stream = quic._streams.get(sid)
+            sent += stream.sender.highest_offset if stream is not None else 0
+        return self.written - sent + len(quic._datagrams_pending) * self.datagram_size
+
     def log_rtt(self, r: float):
         """Record a new RTT sample (seconds)."""
         self.rtts.append(r)
+        self.m_rtt.observe(r)
+
+    def sample_rtt(self, largest_acked, latest_rtt):
+        """
+        Log aioquic's latest RTT if the peer has ACKed a newer packet since the
+        last sample: only then can aioquic have taken a new one.
+        """
+        # 0.0 is aioquic's placeholder until the first real sample
+        if largest_acked > self.largest_acked and latest_rtt:
+            self.largest_acked = largest_acked
+            self.log_rtt(latest_rtt)
+
+    @property
+    def usable(self):
+        """Whether the scheduler may put new data on this path."""
+        return self.state in (PATH_ACTIVE, PATH_SUSPECT)
+
+    def stream_acked(self, slot):
+        """Offset below which every byte of the stream in `slot` has been ACKed."""
+        stream = self.conn._quic._streams.get(self.stream_ids[slot])
+        return stream.sender._buffer_start if stream is not None else 0
+
+    def wrote(self, slot, n):
+        """Account for `n` bytes written to the stream in `slot`."""
+        self.offsets[slot] += n
+        self.written += n
+
+    def add_stream(self, stream_id):
+        """Open another QUIC stream on this path; returns its slot."""
+        self.stream_ids.append(stream_id)
+        self.offsets.append(0)
+        return len(self.stream_ids) - 1
+
+    @property
+    def datagrams_negotiated(self):
+        """Whether the peer accepted the DATAGRAM extension (known after the handshake)."""
+        return self.conn._quic._remote_max_datagram_frame_size is not None
+
+    @property
+    def handshake_complete(self):
+        return self.conn._quic._handshake_complete
+
+    def set_state(self, state, now):
+        PATH_EVENTS.append({
+            "time": now,
+            "path": self.name,
+            "from": self.state,
+            "to": state,
+        })
+        print(f"*** Path {self.name}: {self.state} -> {state}")
+        self.state = state
+
+    def on_datagram_received(self):
+        """
+        Any packet from the peer proves the path is alive.
+
+        Also releases chunks whose stream bytes are now fully acknowledged.
+        """
+        now = time.time()
+        self.last_rx_time = now
+        self.acked_offset = sum(self.stream_acked(slot) for slot in range(len(self.stream_ids)))
+        quic = self.conn._quic
+        if quic._loss.bytes_in_flight == 0 and not quic._datagrams_pending:
+            self.datagram_since = None  # every datagram sent is ACKed or lost
+        if ACKED is not None:
+            ACKED.set()
+
+        while self.inflight and self.inflight[0][2] <= self.stream_acked(self.inflight[0][1]):
+            self.inflight.popleft()
+
+        acked = self.acked_offset
+        mark_time, mark_acked = self.rate_mark
+        if now - mark_time >= RATE_INTERVAL:
+            self.delivery_rate = (acked - mark_acked) / (now - mark_time)
+            self.rate_mark = (now, acked)
+            if self.pacer is not None:
+                self.pacer.bandwidth = self.delivery_rate
+
+        if self.state == PATH_SUSPECT:
+            self.set_state(PATH_ACTIVE, now)
+        elif self.state in (PATH_FAILED, PATH_PROBING):
+            self.reintegrate(now)
+
+    def check_liveness(self, now):
+        """
+        Advance the path state machine based on ACK silence vs. the PTO.
+
+        Silence only counts while something is outstanding: the oldest
+        unacknowledged chunk, a datagram still in flight, or a PING we sent.
+        """
+        loss = self.conn._quic._loss
+        if not loss._rtt_initialized:
+            return  # still handshaking: the PTO is only a guess until the first RTT sample
+        pto = loss.get_probe_timeout()
+
+        if self.state in (PATH_ACTIVE, PATH_SUSPECT):
+            waiting_since = self.last_probe_time if self.state == PATH_SUSPECT else None
+            if self.inflight:
+                waiting_since = self.inflight[0][3]
+            elif self.datagram_since is not None:
+                waiting_since = self.datagram_since
+            if waiting_since is None:
+                return
+            silence = now - max(self.last_rx_time, waiting_since)
+
+            if self.state == PATH_ACTIVE and silence > SUSPECT_PTOS * pto:
+                self.silent_since = max(self.last_rx_time, waiting_since)
+                self.set_state(PATH_SUSPECT, now)
+                self.send_probe(now)
+            elif self.state == PATH_SUSPECT and silence > FAIL_PTOS * pto:
+                self.fail(now)
+
+        elif now - self.last_probe_time >= PROBE_INTERVAL:
+            if self.state == PATH_FAILED:
+                self.set_state(PATH_PROBING, now)
+            self.send_probe(now)
+
+    def send_probe(self, now):
+        self.last_probe_time = now
+        self.conn._quic.send_ping(int(now * 1000))
+        self.conn.transmit()
+
+    def fail(self, now):
+        """Declare the path dead and hand its unacknowledged chunks to RESEND."""
+        self.set_state(PATH_FAILED, now)
+        rescheduled = len(RESEND)
+        while self.inflight:
+            seq, slot, end, _, chunk = self.inflight.popleft()
+            if end > self.stream_acked(slot):  # chunks behind the oldest may be ACKed
+                RESEND.append((seq, slot, chunk, self))
+        PATH_EVENTS.append({
+            "time": now,
+            "path": self.name,
+            "event": "failover_start",
+            "silent_since": self.silent_since,
+            "detection_time": now - self.silent_since,
+            "rescheduled": len(RESEND) - rescheduled,
+        })
+
+    def reintegrate(self, now):
+        """
+        Bring a recovered path back with fresh estimates; the RTT history
+        and send rate from before the outage no longer describe it.
+        """
+        self.set_state(PATH_ACTIVE, now)
+        self.rtts = []
+        self.first_send_time = None
+        self.last_send_time = None
+        self.bytes_sent = 0
+        self.current_weight = 0
+        self.silent_since = None
+        self.last_loss_time = None
+        self.delivery_rate = 0.0
+        self.rate_mark = (now, self.acked_offset)
+        if self.pacer is not None:
+            self.pacer.bandwidth = 0.0
 
 
 def score_path(path, other_last_seq):
@@ -101,13 +458,156 @@ def score_path(path, other_last_seq):
     return pred + reorder_pen
 
 
+def completion_time(path, size):
+    """
+    Estimated time until `size` more bytes would be delivered on `path`.
+
+    Everything already queued or in flight on the path drains first, at the
+    measured delivery rate or cwnd/RTT, whichever is higher; then the chunk
+    still needs half an RTT to reach the receiver.
+    """
+    cwnd = path.conn._quic._loss.congestion_window
+    rate = max(path.delivery_rate, cwnd / path.srtt)
+    return (path.unacked + size) / rate + path.srtt / 2
+
+
+def ecf_choose(paths, size):
+    """
+    Earliest-completion-first path choice for SCHED_ECF.
+
+    Use the fastest path while its congestion window has room. Once it is
+    full, only fall back to another path if that path has room and would
+    deliver the chunk clearly sooner than waiting for the fast one; otherwise
+    return None so the caller waits for ACKs instead of committing data to a
+    slow path and stalling the receiver on reordering. Paths without an RTT
+    sample yet (still handshaking) are not considered.
+    """
+    paths = [p for p in paths if p.conn._quic._loss._rtt_initialized]
+    if not paths:
+        return None
+
+    fast = min(paths, key=lambda p: p.srtt)
+    cwnd = fast.conn._quic._loss.congestion_window
+    if fast.unacked + size <= cwnd:
+        return fast
+
+    t_fast = completion_time(fast, size)
+    for other in sorted((p for p in paths if p is not fast), key=lambda p: completion_time(p, size)):
+        room = other.conn._quic._loss.congestion_window - other.unacked
+        if room >= size and completion_time(other, size) * (1 + ECF_HYSTERESIS) < t_fast:
+            return other
+    return None
+
+
+def choose_paths(sched, pathA, pathB, usable, size):
+    """
+    Scheduler decision for the next chunk of `size` bytes.
+
+    Returns the paths to send it on: one path, both for SCHED_REDUNDANT, or
+    none when SCHED_ECF would rather wait for the fast path.
+    """
+    if len(usable) == 1 and sched != SCHED_REDUNDANT:
+        return usable
+
+    # Choose scheduler
+    if sched == SCHED_MIN_RTT:
+        chosen = pathA if pathA.rtt < pathB.rtt else pathB
+
+    elif sched == SCHED_WRR:
+        # Update weights based on estimated bandwidth
+        pathA.weight = max(1, int(pathA.bw / BASE_WEIGHT))
+        pathB.weight = max(1, int(pathB.bw / BASE_WEIGHT))
+
+        total_weight = pathA.weight + pathB.weight
+
+        # Smooth weighted round robin
+        # we add the weight to the running “priority” counter for that path
+        # Fast path accumulates priority quickly (bigger weight)
+        # Slow path accumulates priority slowly (smaller weight)
+        pathA.current_weight += pathA.weight
+        pathB.current_weight += pathB.weight
+
+        # choose heavier
+        chosen = pathA if pathA.current_weight >= pathB.current_weight else pathB
+
+        # decrease chosen path’s current weight by total
+        # resets the chosen path’s priority downward
+        chosen.current_weight -= total_weight
+
+    elif sched == SCHED_REDUNDANT:
+        return list(usable)
+
+    elif sched == SCHED_PREDICT:
+        scoreA = score_path(pathA, pathB.last_seq)
+        scoreB = score_path(pathB, pathA.last_seq)
+        chosen = pathA if scoreA < scoreB else pathB
+
+    elif sched == SCHED_ECF:
+        chosen = ecf_choose(usable, size)
+        if chosen is None:
+            return []
+
+    else:
+        # fallback just in case
+        print("*** Unknown scheduler, defaulting to path A ***")
+        chosen = pathA
+
+    return [chosen]
+
+
+def place_chunk(sched, stream, pathA, pathB, usable):
+    """
+    Paths for the next chunk of logical `stream` (--streams).
+
+    Paced, latency-sensitive streams go to the path that would deliver the
+    chunk soonest, counting what is already queued on it. Backlogged (bulk)
+    streams fill the remaining capacity: `sched` chooses among the paths
+    whose congestion window still has room, and none is chosen while every
+    window is full, so bulk data never queues up in QUIC ahead of urgent
+    chunks.
+    """
+    size = stream.chunk_size
+    if not stream.elastic:
+        return [min(usable, key=lambda p: completion_time(p, size))]
+    room = [p for p in usable if p.unacked + size <= p.conn._quic._loss.congestion_window]
+    if not room:
+        return []
+    return choose_paths(sched, pathA, pathB, room, size)
+
+
+def choose_delivery(mode, path, size):
+    """
+    Reliable stream or unreliable datagram for a chunk of `size` bytes on `path`.
+
+    DELIVERY_AUTO picks the datagram when the stream would deliver the chunk
+    after DATAGRAM_DEADLINE (queued behind unACKed data, e.g. retransmissions)
+    or the path lost packets within LOSS_MEMORY: media that arrives late is
+    worthless, so it is not worth waiting for retransmissions. DELIVERY_AUTO
+    chunks go on the stream until the peer has accepted the DATAGRAM
+    extension; DELIVERY_DATAGRAM waits for it before sending (see
+    wait_for_paths).
+    """
+    if mode == DELIVERY_STREAM or not path.datagrams_negotiated:
+        return DELIVERY_STREAM
+    if mode == DELIVERY_DATAGRAM:
+        return DELIVERY_DATAGRAM
+
+    now = time.time()
+    if path.last_loss_time is not None and now - path.last_loss_time < LOSS_MEMORY:
+        return DELIVERY_DATAGRAM
+    if completion_time(path, size) > DATAGRAM_DEADLINE:
+        return DELIVERY_DATAGRAM
+    return DELIVERY_STREAM
+
+
 class MPQuicProtocol(QuicConnectionProtocol):
     """
     Custom protocol that exposes per-path RTT back to PathState.
 
-    We don't get explicit ACK events from aioquic at the app layer, but every
-    time an event is delivered, the loss-recovery module has up-to-date RTT.
-    We read _loss._latest_rtt and push it into the associated PathState.
+    We don't get explicit ACK events from aioquic at the app layer, but after
+    every received datagram the loss-recovery module has up-to-date RTT. When
+    the datagram ACKed a new packet we push _loss._rtt_latest into the
+    associated PathState.
     """
 
     def __init__(self, *args, **kwargs):
@@ -115,22 +615,29 @@ class MPQuicProtocol(QuicConnectionProtocol):
         self.path_state = None
         super().__init__(*args, **kwargs)
 
-    def quic_event_received(self, event: QuicEvent) -> None:
-        print("GOT EVENT:", event)
+    def datagram_received(self, data, addr) -> None:
+        t = PHASES.start()
+        super().datagram_received(data, addr)
+        if self.path_state is not None:
+            self.path_state.sample_rtt(self._quic._spaces[tls.Epoch.ONE_RTT].largest_acked_packet,
+                                       self._quic._loss._rtt_latest)
+            self.path_state.on_datagram_received()
+        PHASES.lap("datagram_received", t)
 
-        # Continue normal aioquic processing
-        super().quic_event_received(event)
+    def quic_event_received(self, event: QuicEvent) -> None:
+        if VERBOSE:
+            print("GOT EVENT:", event)
 
-        # Read RTT estimate directly from loss-recovery
-        if self.path_state is not None:
-            loss = self._quic._loss
-            latest_rtt = getattr(loss, "_rtt_latest", None)
-            print("LATEST_RTT:", latest_rtt)
-            if latest_rtt is not None:
-                self.path_state.log_rtt(latest_rtt)
+        # Continue normal aioquic processing. Stream data (the server's ACK
+        # echoes) is not routed into asyncio stream readers: on Python >= 3.11.5
+        # the unused writer aioquic creates gets garbage-collected, and closing
+        # it sends FIN on our stream.
+        if not isinstance(event, StreamDataReceived):
+            super().quic_event_received(event)
 
 
-async def quic_connect(local_ip, server_ip, port=4443):
+async def quic_connect(local_ip, server_ip, port=4443, cc="reno", cc_group=None,
+                       protocol_class=None):
     import ssl  # must import ssl here or at top of file
 
     # 1. QUIC client configuration
@@ -138,6 +645,10 @@ async def quic_connect(local_ip, server_ip, port=4443):
         is_client=True,
         alpn_protocols=["hq-29"],
     )
+    if cc_group is None:
+        conf.congestion_control_algorithm = cc
+    # offer the DATAGRAM extension (RFC 9221) for --delivery datagram|auto
+    conf.max_datagram_frame_size = MAX_DATAGRAM_FRAME_SIZE
 
     # Disable certificate verification (self-signed cert)
     conf.verify_mode = ssl.CERT_NONE
@@ -148,16 +659,20 @@ async def quic_connect(local_ip, server_ip, port=4443):
 
     # 3. Create low-level QUIC connection
     quic = QuicConnection(configuration=conf)
+    if cc_group is not None:
+        install_coupled_cc(quic, cc_group)
 
     # 4. Wrap inside our custom protocol
-    protocol = MPQuicProtocol(quic)
+    protocol = (protocol_class or MPQuicProtocol)(quic)
 
     # 5. Register with asyncio event loop
     loop = asyncio.get_event_loop()
     await loop.create_datagram_endpoint(lambda: protocol, sock=sock)
 
     # 6. Connect + kick off handshake
-    quic.connect((server_ip, port), now=time.time())
+    # (aioquic timestamps packets with the loop's monotonic clock, so the
+    # handshake must use it too or the first RTT sample comes out negative)
+    quic.connect((server_ip, port), now=loop.time())
     protocol.transmit()
 
     return protocol
@@ -171,29 +686,425 @@ def open_stream_id(quic):
         return quic.get_next_available_stream_id()
 
 
-def send_chunk(pstate: PathState, stream_id: int, chunk: bytes):
+def send_chunk(pstate: PathState, chunk: bytes, seq=None, slot=0):
+    """
+    Send a single chunk on the given path, on its stream in `slot`.
+    Updates timing needed for bandwidth estimation, and remembers the chunk
+    until it is ACKed so it can be rescheduled if the path fails.
+    """
+    now = time.time()
+    if pstate.first_send_time is None:
+        pstate.first_send_time = now
+    pstate.last_send_time = now
+
+    pstate.wrote(slot, len(chunk))
+    if seq is not None:
+        pstate.inflight.append((seq, slot, pstate.offsets[slot], now, chunk))
+
+    t = PHASES.start()
+    pstate.conn._quic.send_stream_data(pstate.stream_ids[slot], chunk, end_stream=False)
+    t = PHASES.lap("send_stream_data", t)
+    pstate.conn.transmit()
+    t = PHASES.lap("transmit", t)
+    pstate.m_scheduled.inc()
+    if VERBOSE:
+        print(f"SENDING {len(chunk)} bytes on path", pstate.name)
+        PHASES.lap("print", t)
+
+
+def send_datagram(pstate: PathState, chunk: bytes):
     """
-    Send a single chunk on the given path / stream.
-    Updates timing needed for bandwidth estimation.
+    Send a single chunk as one DATAGRAM frame on the given path.
+    It is not remembered: a lost or failed-over datagram is not resent.
     """
     now = time.time()
     if pstate.first_send_time is None:
         pstate.first_send_time = now
     pstate.last_send_time = now
+    if pstate.datagram_since is None:
+        pstate.datagram_since = now
+    pstate.datagram_size = len(chunk)
 
-    pstate.conn._quic.send_stream_data(stream_id, chunk, end_stream=False)
+    t = PHASES.start()
+    pstate.conn._quic.send_datagram_frame(chunk)
+    t = PHASES.lap("send_datagram_frame", t)
     pstate.conn.transmit()
-    print(f"SENDING {len(chunk)} bytes on path", pstate.name)
+    t = PHASES.lap("transmit", t)
+    pstate.m_datagrams.inc()
+    if VERBOSE:
+        print(f"SENDING {len(chunk)} byte datagram on path", pstate.name)
+        PHASES.lap("print", t)
+
+
+def log_chunk(seq, path_label, pathA, pathB, **extra):
+    """Append a per-chunk run log entry with both paths' scheduler and CC state."""
+    ccA = pathA.conn._quic._loss._cc
+    ccB = pathB.conn._quic._loss._cc
+    LOG.append({
+        "seq": seq,
+        "path": path_label,
+        **extra,
+        "rttA": pathA.rtt,
+        "rttB": pathB.rtt,
+        "jitA": pathA.jitter,
+        "jitB": pathB.jitter,
+        "bwA": pathA.bw,
+        "bwB": pathB.bw,
+        "cwndA": ccA.congestion_window,
+        "cwndB": ccB.congestion_window,
+        "ssthreshA": ccA.ssthresh,
+        "ssthreshB": ccB.ssthresh,
+        "bytes_in_flightA": ccA.bytes_in_flight,
+        "bytes_in_flightB": ccB.bytes_in_flight,
+        "lostA": pathA.m_lost.value,
+        "lostB": pathB.m_lost.value,
+        "time": time.time()
+    })
+
+
+def write_segments(log_dir, abr):
+    """Write an --abr run's segment plan and the sender's QoE estimate to segments.json."""
+    with open(f"{log_dir}/segments.json", "w") as f:
+        json.dump({
+            "abr": abr.algorithm,
+            "plan": abr.plan,
+            "sender_estimate": abr.buffer.summary() if abr.buffer else None,
+        }, f, indent=2)
+
+
+def acked_seq(paths):
+    """Sequence number below which every chunk sent on a stream has been ACKed."""
+    pending = [p.inflight[0][0] for p in paths if p.inflight] + [seq for seq, _, _, _ in RESEND]
+    return min(pending + [SEQ])
+
+
+async def wait_for_paths(paths, delivery):
+    """
+    Wait up to HANDSHAKE_TIMEOUT for every path's handshake and first RTT
+    sample before scheduling. Until then the schedulers compare default
+    estimates and can commit all the data to the slow path before the
+    first ACK.
+
+    With --delivery datagram the handshake also settles whether the peer
+    accepted DATAGRAM frames; raises if one did not, or never answered.
+    """
+    def ready(p):
+        return p.handshake_complete and p.conn._quic._loss._rtt_initialized
+
+    deadline = time.time() + HANDSHAKE_TIMEOUT
+    while not all(ready(p) for p in paths):
+        if time.time() > deadline:
+            waiting = ", ".join(p.name for p in paths if not ready(p))
+            if delivery == DELIVERY_DATAGRAM:
+                raise RuntimeError(f"--delivery datagram: path {waiting} not ready "
+                                   f"after {HANDSHAKE_TIMEOUT:.0f}s")
+            print(f"*** No RTT sample on path {waiting} after {HANDSHAKE_TIMEOUT:.0f}s, "
+                  f"scheduling without it")
+            return
+        await asyncio.sleep(LIVENESS_INTERVAL)
+    if delivery != DELIVERY_DATAGRAM:
+        return
+    refused = ", ".join(p.name for p in paths if not p.datagrams_negotiated)
+    if refused:
+        raise RuntimeError(f"--delivery datagram: the peer refused DATAGRAM frames on path {refused}")
+
+
+async def path_monitor(paths):
+    """Periodically run the liveness state machine on every path."""
+    while True:
+        now = time.time()
+        for p in paths:
+            p.check_liveness(now)
+        await asyncio.sleep(LIVENESS_INTERVAL)
+
+
+async def wait_for_pacing(paths):
+    """
+    With --pacing, wait until every path in `paths` is ready for another
+    chunk: QUIC holds no more than a burst of unsent data for it, and its
+    token bucket has refilled. Both are timed waits (for an ACK, or until
+    the bucket has tokens), so the send loop does not spin.
+    """
+    loop = asyncio.get_running_loop()
+    for p in paths:
+        while p.usable:
+            delay = p.pacer.delay(loop.time())
+            if delay:
+                await asyncio.sleep(delay)
+                continue
+            if p.unsent <= p.pacer.burst:
+                break
+            # tokens to spare: send what the window allows, then wait for an
+            # ACK if QUIC still holds data back (window full, handshaking)
+            p.conn.transmit()
+            if p.unsent > p.pacer.burst and not p.pacer.delay(loop.time()):
+                ACKED.clear()
+                try:
+                    await asyncio.wait_for(ACKED.wait(), LIVENESS_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+
+def resend_failed(paths):
+    """
+    Move one chunk stranded on a failed path onto a surviving path.
 
+    Returns True if something was resent.
+    """
+    usable = [p for p in paths if p.state == PATH_ACTIVE] or \
+        [p for p in paths if p.usable]
+    if not RESEND or not usable:
+        return False
+
+    seq, slot, chunk, failed = RESEND.popleft()
+    target = min(usable, key=lambda p: p.rtt)
+    send_chunk(target, chunk, seq, slot)
+    target.bytes_sent += len(chunk)
+    target.m_resent.inc()
+
+    now = time.time()
+    if failed.silent_since is not None:
+        PATH_EVENTS.append({
+            "time": now,
+            "path": failed.name,
+            "event": "failover_done",
+            "to": target.name,
+            "failover_time": now - failed.silent_since,
+        })
+        failed.silent_since = None
+
+    log_chunk(seq, target.name, paths[0], paths[1], delivery=DELIVERY_STREAM, resent=True)
+    return True
+
+
+def record_loop_error(loop, context):
+    """Event loop exception handler: log the error as asyncio would, and keep it."""
+    LOOP_ERRORS.append(context.get("exception") or context["message"])
+    loop.default_exception_handler(context)
+
+
+def reset_run():
+    """Clear the send state of a previous run (server.py serves one download after another)."""
+    global SEQ, LOG, PATH_EVENTS, ACKED
+    SEQ = 0
+    LOG = []
+    PATH_EVENTS = []
+    RESEND.clear()
+    ACKED = asyncio.Event()
+
+
+async def send_chunks(sched, pathA, pathB, total, chunk_size, delivery=DELIVERY_STREAM, pacing=False,
+                      abr=None):
+    """
+    Schedule `total` chunks of `chunk_size` bytes over pathA and pathB with
+    `sched`, and return once every one is ACKed, lost as a datagram, or the
+    drain times out (then False). The client runs this for uploads,
+    server.py for downloads; each logs its decisions to LOG and PATH_EVENTS.
 
-async def main(sched=SCHED_PREDICT):
-    global SEQ, LOG
+    With an AbrSession (abr.py) the chunks come in segments instead, whose
+    number of chunks its controller picks as each one starts.
+    """
+    global SEQ
 
-    print(f"*** Starting scheduler: {sched}")
+    paths = [pathA, pathB]
+    await wait_for_paths(paths, delivery)
+    monitor = asyncio.ensure_future(path_monitor(paths))
+    completed = True
+    try:
+        drain_deadline = None
+        drain_acked = 0
+
+        # Keep going until every chunk is sent and ACKed (or rescheduled) on a live
+        # path, and every datagram sent on one is ACKed or lost
+        while SEQ < total or RESEND or (abr is not None and abr.remaining) or \
+                any(p.inflight or p.datagram_since is not None for p in paths if p.usable):
+            # NOTE: RTT is now populated by MPQuicProtocol.datagram_received
+            t = PHASES.start()
+
+            # Chunks stranded on a failed path go out before new data
+            if resend_failed(paths):
+                t = PHASES.lap("resend", t)
+                await asyncio.sleep(0)
+                PHASES.lap("yield", t)
+                continue
+            if SEQ >= total and abr is not None and abr.remaining:
+                # next segment once the last one is ACKed and the buffer has room
+                now = time.time()
+                if not abr.ready(acked_seq(paths), now):
+                    ACKED.clear()
+                    try:
+                        await asyncio.wait_for(ACKED.wait(), LIVENESS_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                total += abr.next_segment(SEQ, paths, now)
+            if SEQ >= total:
+                # a slow path may take long to drain; only give up once it stalls
+                acked = sum(p.acked_offset for p in paths)
+                if drain_deadline is None or acked > drain_acked:
+                    drain_deadline, drain_acked = time.time() + DRAIN_TIMEOUT, acked
+                elif time.time() > drain_deadline:
+                    print("*** Timed out waiting for outstanding chunks")
+                    completed = False
+                    break
+                await asyncio.sleep(LIVENESS_INTERVAL)
+                continue
+
+            CHUNK = make_chunk(SEQ, chunk_size)
+            t = PHASES.lap("make_chunk", t)
+
+            # Only schedule across live paths; prefer active over suspect ones
+            usable = [p for p in paths if p.state == PATH_ACTIVE] or \
+                [p for p in paths if p.usable]
+
+            if not usable:
+                await asyncio.sleep(LIVENESS_INTERVAL)
+                continue
+
+            targets = choose_paths(sched, pathA, pathB, usable, chunk_size)
+            PHASES.lap("schedule", t)
+            if not targets:
+                # worth waiting for the fast path: sleep until an ACK arrives
+                ACKED.clear()
+                try:
+                    await asyncio.wait_for(ACKED.wait(), LIVENESS_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # send chunk on chosen path(s), each over the stream or as a datagram
+            modes = []
+            for p in targets:
+                mode = choose_delivery(delivery, p, chunk_size)
+                if mode == DELIVERY_DATAGRAM:
+                    send_datagram(p, CHUNK)
+                else:
+                    send_chunk(p, CHUNK, SEQ)
+                modes.append(mode)
+                p.bytes_sent += len(CHUNK)
+                p.last_seq = SEQ
 
-    # Connect both paths
-    connA = await quic_connect("10.0.1.1", "10.0.1.2")
-    connB = await quic_connect("10.0.2.1", "10.0.2.2")
+            t = PHASES.start()
+            segment = {} if abr is None else {"segment": abr.current}
+            log_chunk(SEQ, "+".join(p.name for p in targets), pathA, pathB,
+                      delivery="+".join(modes), **segment)
+            t = PHASES.lap("log", t)
+
+            SEQ += 1
+            if pacing:
+                await wait_for_pacing(targets)
+            else:
+                await asyncio.sleep(0)
+            PHASES.lap("yield", t)
+        if abr is not None:
+            abr.ready(acked_seq(paths), time.time())  # mark the last segment delivered
+    finally:
+        monitor.cancel()
+    return completed
+
+
+async def send_streams(sched, pathA, pathB, streams, duration):
+    """
+    Send prioritized logical streams (streams.py) over pathA and pathB for
+    `duration` seconds, then wait for the outstanding chunks like
+    send_chunks() (False if that times out). Each turn serves the most
+    urgent stream with a chunk due that place_chunk() finds a path for.
+    """
+    global SEQ
+
+    paths = [pathA, pathB]
+    await wait_for_paths(paths, DELIVERY_STREAM)
+    monitor = asyncio.ensure_future(path_monitor(paths))
+    end = time.time() + duration
+    drain_deadline = end + DRAIN_TIMEOUT
+    drain_acked = 0
+    completed = True
+    try:
+        while True:
+            now = time.time()
+            for stream in streams:
+                stream.generate(now, end)
+
+            if resend_failed(paths):
+                await asyncio.sleep(0)
+                continue
+            usable = [p for p in paths if p.state == PATH_ACTIVE] or \
+                [p for p in paths if p.usable]
+            due = by_priority(streams)
+            if not due and now >= end:
+                if not any(p.inflight for p in usable):
+                    break
+                acked = sum(p.acked_offset for p in paths)
+                if acked > drain_acked:
+                    drain_deadline, drain_acked = now + DRAIN_TIMEOUT, acked
+                elif now > drain_deadline:
+                    print("*** Timed out waiting for outstanding chunks")
+                    completed = False
+                    break
+
+            chosen = targets = None
+            if usable:
+                for stream in due:
+                    targets = place_chunk(sched, stream, pathA, pathB, usable)
+                    if targets:
+                        chosen = stream
+                        break
+            if chosen is None:
+                # nothing due, or only bulk with every window full: wait for
+                # an ACK or the next paced chunk
+                wake = next_due(streams)
+                timeout = LIVENESS_INTERVAL if wake is None else \
+                    min(LIVENESS_INTERVAL, max(0.0, wake - now))
+                ACKED.clear()
+                try:
+                    await asyncio.wait_for(ACKED.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            served(chosen, streams)
+            chunk = make_chunk(SEQ, chosen.chunk_size, chosen.take())
+            for p in targets:
+                send_chunk(p, chunk, SEQ, chosen.slot)
+                p.bytes_sent += len(chunk)
+                p.last_seq = SEQ
+            log_chunk(SEQ, "+".join(p.name for p in targets), pathA, pathB,
+                      delivery=DELIVERY_STREAM, stream=chosen.name)
+            SEQ += 1
+            await asyncio.sleep(0)
+    finally:
+        monitor.cancel()
+    return completed
+
+
+async def main(sched=SCHED_PREDICT,
+               local_a="10.0.1.1", server_a=("10.0.1.2", 4443),
+               local_b="10.0.2.1", server_b=("10.0.2.2", 4443),
+               metrics_port=None, metrics_file=None, metrics_interval=1.0,
+               cc="reno", total=500, chunk_size=500,
+               phase_timers=False, loop_lag=False, profile=None, profile_interval=SAMPLE_INTERVAL,
+               workers="inline", delivery=DELIVERY_STREAM, pacing=False, pacing_burst=DEFAULT_BURST,
+               abr=None, segments=DEFAULT_SEGMENTS, streams=None, duration=DEFAULT_DURATION):
+    asyncio.get_running_loop().set_exception_handler(record_loop_error)
+    reset_run()
+    PHASES.enabled = phase_timers
+    if loop_lag:
+        lag_monitor = asyncio.ensure_future(LOOP_LAG.run())
+    if profile:
+        profiler = Profiler(profile, profile_interval)
+        profiler.start()
+    print(f"*** Starting scheduler: {sched} (congestion control: {cc}, delivery: {delivery})")
+
+    if workers == "process":
+        # each path's QUIC connection runs in its own process (path_worker.py)
+        from path_worker import start_path_worker
+        connA = start_path_worker("A", local_a, server_a, cc)
+        connB = start_path_worker("B", local_b, server_b, cc)
+    else:
+        # Connect both paths; coupled controllers share one group across them
+        cc_group = COUPLED_ALGORITHMS[cc]() if cc in COUPLED_ALGORITHMS else None
+        connA = await quic_connect(local_a, *server_a, cc=cc, cc_group=cc_group)
+        connB = await quic_connect(local_b, *server_b, cc=cc, cc_group=cc_group)
 
     # Open streams
     streamA = open_stream_id(connA._quic)
@@ -207,117 +1118,332 @@ async def main(sched=SCHED_PREDICT):
     connA.path_state = pathA
     connB.path_state = pathB
 
-    print("connA type =", type(connA))
-    print("protocol internal =", connA._quic)
-
-    # send scheduler header on both streams
-    header = f"SCHED:{sched}".encode()
-    pA = pathA.conn._quic
-    pB = pathB.conn._quic
-    pA.send_stream_data(streamA, header, end_stream=False)
-    pB.send_stream_data(streamB, header, end_stream=False)
-    pathA.conn.transmit()
-    pathB.conn.transmit()
-
-    CHUNK = b"x" * 500
-    TOTAL = 500
-
-    while SEQ < TOTAL:
-        # NOTE: RTT is now populated by MPQuicProtocol.quic_event_received
-
-        # Choose scheduler
-        if sched == SCHED_MIN_RTT:
-            chosen = pathA if pathA.rtt < pathB.rtt else pathB
-
-        elif sched == SCHED_WRR:
-            # Update weights based on estimated bandwidth
-            pathA.weight = max(1, int(pathA.bw / BASE_WEIGHT))
-            pathB.weight = max(1, int(pathB.bw / BASE_WEIGHT))
-
-            total_weight = pathA.weight + pathB.weight
-
-            # Smooth weighted round robin
-            # we add the weight to the running “priority” counter for that path
-            # Fast path accumulates priority quickly (bigger weight)
-            # Slow path accumulates priority slowly (smaller weight)
-            pathA.current_weight += pathA.weight
-            pathB.current_weight += pathB.weight
-
-            # choose heavier
-            chosen = pathA if pathA.current_weight >= pathB.current_weight else pathB
-
-            # decrease chosen path’s current weight by total
-            # resets the chosen path’s priority downward
-            chosen.current_weight -= total_weight
-
-        elif sched == SCHED_REDUNDANT:
-            send_chunk(pathA, pathA.stream, CHUNK)
-            send_chunk(pathB, pathB.stream, CHUNK)
-            for p in [pathA, pathB]:
-                p.bytes_sent += len(CHUNK)
-                p.last_seq = SEQ
-
-            LOG.append({
-                "seq": SEQ,
-                "path": "A+B",
-                "rttA": pathA.rtt,
-                "rttB": pathB.rtt,
-                "jitA": pathA.jitter,
-                "jitB": pathB.jitter,
-                "bwA": pathA.bw,
-                "bwB": pathB.bw,
-                "time": time.time()
-            })
-            SEQ += 1
-            await asyncio.sleep(0)
-            continue
-
-        elif sched == SCHED_PREDICT:
-            scoreA = score_path(pathA, pathB.last_seq)
-            scoreB = score_path(pathB, pathA.last_seq)
-            chosen = pathA if scoreA < scoreB else pathB
-
-        else:
-            # fallback just in case
-            print("*** Unknown scheduler, defaulting to path A ***")
-            chosen = pathA
-
-        # send chunk on chosen path
-        send_chunk(chosen, chosen.stream, CHUNK)
-        chosen.bytes_sent += len(CHUNK)
-        chosen.last_seq = SEQ
-
-        LOG.append({
-            "seq": SEQ,
-            "path": chosen.name,
-            "rttA": pathA.rtt,
-            "rttB": pathB.rtt,
-            "jitA": pathA.jitter,
-            "jitB": pathB.jitter,
-            "bwA": pathA.bw,
-            "bwB": pathB.bw,
-            "time": time.time()
-        })
-
-        SEQ += 1
-        await asyncio.sleep(0)
+    if pacing:
+        for p in (pathA, pathB):
+            p.pacer = install_pacer(p.conn._quic, pacing_burst)
+
+    if VERBOSE:
+        print("connA type =", type(connA))
+        print("protocol internal =", connA._quic)
+
+    if metrics_port:
+        await serve_http(METRICS, metrics_port)
+    if metrics_file:
+        snapshots = asyncio.ensure_future(write_snapshots(METRICS, metrics_file, metrics_interval))
+
+    # send scheduler header on both streams; with --streams every logical
+    # stream gets a QUIC stream of its own on each path, in the same slot
+    run_id = int(time.time() * 1000)
+    for p in [pathA, pathB]:
+        for slot, stream in enumerate(streams or [None]):
+            if slot:
+                # aioquic only takes the stream ID once data is sent on it
+                p.add_stream(open_stream_id(p.conn._quic))
+            header = make_header(sched, run_id, p.name, stream and stream.name)
+            p.conn._quic.send_stream_data(p.stream_ids[slot], header, end_stream=False)
+            p.conn.transmit()
+            p.wrote(slot, len(header))
+    for slot, stream in enumerate(streams or []):
+        stream.slot = slot
+
+    paths = [pathA, pathB]
+    abr_session = AbrSession(abr, segments, chunk_size) if abr else None
+    if streams:
+        completed = await send_streams(sched, pathA, pathB, streams, duration)
+    else:
+        completed = await send_chunks(sched, pathA, pathB, 0 if abr else total, chunk_size,
+                                      delivery, pacing, abr_session)
+
+    if workers == "process":
+        for p in paths:
+            p.conn.close()
+    if metrics_file:
+        snapshots.cancel()
+        write_snapshot(METRICS, metrics_file)
 
     log_dir = f"runs/{sched}"
     os.makedirs(log_dir, exist_ok=True)
 
+    if profile:
+        profiler.stop(f"{log_dir}/client_profile")
+    if loop_lag:
+        lag_monitor.cancel()
+    if phase_timers or loop_lag:
+        phases = PHASES.summary()
+        lag = LOOP_LAG.summary() if loop_lag else None
+        print_summary("Client send-loop phases", phases, lag)
+        write_summary(f"{log_dir}/client_phases.json", phases, lag)
+
     out_path = f"{log_dir}/client_log.json"
     with open(out_path, "w") as f:
         json.dump(LOG, f, indent=2)
 
-    print(f"*** Done - wrote {out_path}")
+    events_path = f"{log_dir}/path_events.json"
+    with open(events_path, "w") as f:
+        json.dump(PATH_EVENTS, f, indent=2)
+    if abr_session is not None:
+        write_segments(log_dir, abr_session)
+
+    with open(f"{log_dir}/run_info.json", "w") as f:
+        json.dump({
+            "sched": sched,
+            "cc": cc,
+            "delivery": delivery,
+            "pacing_burst": pacing_burst if pacing else None,
+            "abr": abr,
+            "streams": [s.describe() for s in streams] if streams else None,
+            "run_id": run_id,
+            "chunks": SEQ,
+            "chunk_size": chunk_size,
+            "start": LOG[0]["time"] if LOG else None,
+            "end": time.time(),
+            "acked_bytes": {p.name: p.acked_offset for p in paths},
+            "completed": completed,
+        }, f, indent=2)
+
+    print(f"*** Done - wrote {out_path} and {events_path}")
+    return completed
+
+
+class ReceiveLog:
+    """Chunks the client receives in download mode, logged like server.py's server_log.json."""
+
+    def __init__(self, total):
+        self.total = total  # None: not known in advance (--abr)
+        self.entries = []
+        self.seen = set()
+        self.ended = 0      # streams the server has finished
+        self.refused = None  # the server's reason, if it refused the download
+        self.last_rx_time = time.time()
+
+    def record(self, path_name, sid, seq, size, sent, delivery=DELIVERY_STREAM):
+        now = time.time()
+        self.last_rx_time = now
+        self.entries.append({
+            "timestamp": now,
+            "stream_id": sid,
+            "size": size,
+            "seq": seq,
+            "path": path_name,
+            "delivery": delivery,
+            "latency": now - sent,
+            "duplicate": seq in self.seen,
+        })
+        self.seen.add(seq)
+
+    def complete(self, streams):
+        """
+        Every chunk has arrived, or every stream has ended and no datagram
+        has followed for DATAGRAM_DEADLINE (the rest were lost).
+        """
+        if self.total is not None and len(self.seen) >= self.total:
+            return True
+        return self.ended >= streams and time.time() - self.last_rx_time > DATAGRAM_DEADLINE
+
+
+class DownloadProtocol(MPQuicProtocol):
+    """Client path connection in download mode: logs the chunks the server sends on it."""
+
+    def __init__(self, *args, **kwargs):
+        self.receiver = None
+        self.path_name = None
+        self._readers = {}
+        super().__init__(*args, **kwargs)
+
+    def quic_event_received(self, event: QuicEvent) -> None:
+        super().quic_event_received(event)
+        if self.receiver is None:
+            return
+
+        if isinstance(event, DatagramFrameReceived):
+            chunk = parse_datagram(event.data)
+            if chunk is not None:
+                self.receiver.record(self.path_name, None, *chunk, delivery=DELIVERY_DATAGRAM)
+
+        elif isinstance(event, StreamDataReceived):
+            reader = self._readers.get(event.stream_id)
+            if reader is None:
+                reader = self._readers[event.stream_id] = ChunkReader()
+            for chunk in reader.feed(event.data):
+                self.receiver.record(self.path_name, event.stream_id, *chunk)
+            if reader.refused is not None:
+                self.receiver.refused = reader.refused
+            if event.end_stream:
+                self.receiver.ended += 1
+
+
+async def download(sched=SCHED_PREDICT,
+                   local_a="10.0.1.1", server_a=("10.0.1.2", 4443),
+                   local_b="10.0.2.1", server_b=("10.0.2.2", 4443),
+                   total=500, chunk_size=500, delivery=DELIVERY_STREAM,
+                   pacing=False, pacing_burst=DEFAULT_BURST, abr=None, segments=DEFAULT_SEGMENTS):
+    """
+    Download mode: announce both paths and the content wanted with a GET
+    request on each, then log the chunks the server schedules back until all
+    have arrived, both streams end, or nothing arrives for DRAIN_TIMEOUT.
+    Returns False if the server refused the download or it timed out.
+    """
+    asyncio.get_running_loop().set_exception_handler(record_loop_error)
+    print(f"*** Starting download: {sched} (delivery: {delivery})")
+    receiver = ReceiveLog(None if abr else total)
+    conns = []
+    for name, local_ip, server in (("A", local_a, server_a), ("B", local_b, server_b)):
+        conn = await quic_connect(local_ip, *server, protocol_class=DownloadProtocol)
+        conn.receiver = receiver
+        conn.path_name = name
+        conns.append(conn)
+
+    run_id = int(time.time() * 1000)
+    start = time.time()
+    for name, conn in zip("AB", conns):
+        request = make_request(sched, run_id, name, total, chunk_size, delivery,
+                               pacing_burst if pacing else 0, abr, segments)
+        conn._quic.send_stream_data(open_stream_id(conn._quic), request, end_stream=False)
+        conn.transmit()
+
+    completed = True
+    while not receiver.complete(len(conns)) and receiver.refused is None:
+        if time.time() - receiver.last_rx_time > DRAIN_TIMEOUT:
+            print("*** Timed out waiting for the server's chunks")
+            completed = False
+            break
+        await asyncio.sleep(LIVENESS_INTERVAL)
+
+    for conn in conns:
+        conn.close()
+    if receiver.refused is not None:
+        print(f"*** Server refused the download: {receiver.refused}")
+        return False
+
+    log_dir = f"runs/download/{sched}"
+    os.makedirs(log_dir, exist_ok=True)
+    out_path = f"{log_dir}/receive_log.json"
+    with open(out_path, "w") as f:
+        json.dump(receiver.entries, f, indent=2)
+
+    with open(f"{log_dir}/run_info.json", "w") as f:
+        json.dump({
+            "sched": sched,
+            "direction": DIRECTION_DOWNLOAD,
+            "delivery": delivery,
+            "pacing_burst": pacing_burst if pacing else None,
+            "abr": abr,
+            "run_id": run_id,
+            "chunks": None if abr else total,
+            "chunk_size": chunk_size,
+            "start": start,
+            "end": receiver.last_rx_time,
+            "received": len(receiver.seen),
+            "completed": completed,
+        }, f, indent=2)
+
+    print(f"*** Done - received {len(receiver.seen)} chunks, wrote {out_path}")
+    return completed
+
+
+def parse_server(s):
+    host, _, port = s.partition(":")
+    return host, int(port or 4443)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2 or sys.argv[1] not in VALID_SCHEDULERS:
-        print("Usage: python3 scheduler_client.py [minrtt|wrr|redundant|predict]")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        usage="python3 scheduler_client.py [minrtt|wrr|redundant|predict|ecf] [options]")
+    parser.add_argument("sched", choices=VALID_SCHEDULERS)
+    # Defaults match the Mininet topologies; point these at link_emulator.py
+    # to run over the userspace emulator instead
+    parser.add_argument("--local-a", default="10.0.1.1")
+    parser.add_argument("--local-b", default="10.0.2.1")
+    parser.add_argument("--server-a", type=parse_server, default=("10.0.1.2", 4443))
+    parser.add_argument("--server-b", type=parse_server, default=("10.0.2.2", 4443))
+    parser.add_argument("--direction", choices=VALID_DIRECTIONS, default=DIRECTION_UPLOAD,
+                        help="schedule chunks to the server, or have the server schedule them back")
+    parser.add_argument("--chunks", type=int, default=500, help="number of chunks to send")
+    parser.add_argument("--chunk-size", type=int, default=500, help="bytes per chunk")
+    parser.add_argument("--cc", choices=VALID_CC, default="reno",
+                        help="per-path aioquic controller, or a coupled one (lia, balia)")
+    parser.add_argument("--delivery", choices=VALID_DELIVERY, default=DELIVERY_STREAM,
+                        help="send chunks over reliable streams, as unreliable QUIC datagrams, "
+                             "or choose per chunk")
+    parser.add_argument("--pacing", action="store_true",
+                        help="pace each path with a token bucket at its estimated bandwidth")
+    parser.add_argument("--pacing-burst", type=int, default=DEFAULT_BURST,
+                        help="bytes a path may send back to back when paced")
+    parser.add_argument("--abr", choices=ABR_ALGORITHMS,
+                        help="send a video of --segments segments, the sender picking each one's "
+                             "bitrate (instead of --chunks chunks)")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS,
+                        help="segments of video to send with --abr")
+    parser.add_argument("--streams", nargs="?", const=DEFAULT_STREAMS,
+                        help="send prioritized logical streams (name[:priority[:weight]],...; "
+                             f"default {DEFAULT_STREAMS}) for --duration seconds instead of --chunks")
+    parser.add_argument("--duration", type=float, default=DEFAULT_DURATION,
+                        help="seconds the paced --streams generate chunks for")
+    parser.add_argument("--workers", choices=["inline", "process"], default="inline",
+                        help="run both paths in this event loop, or each path in its own process")
+    parser.add_argument("--verbose", action="store_true", help="print every QUIC event and send")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port")
+    parser.add_argument("--metrics-file", help="append JSON metric snapshots to this file")
+    parser.add_argument("--metrics-interval", type=float, default=1.0)
+    parser.add_argument("--phase-timers", action="store_true",
+                        help="time each send-loop phase; summary in runs/<sched>/client_phases.json")
+    parser.add_argument("--loop-lag", action="store_true", help="monitor event-loop lag")
+    parser.add_argument("--profile", choices=PROFILERS,
+                        help="profile the run; output in runs/<sched>/client_profile.*")
+    parser.add_argument("--profile-interval", type=float, default=SAMPLE_INTERVAL,
+                        help="seconds between stack samples for --profile sample")
+    args = parser.parse_args()
+    if args.workers == "process" and not rings_supported():
+        parser.error("--workers process needs an x86 CPU (see ring_buffer.py)")
+    if args.workers == "process" and args.cc in COUPLED_ALGORITHMS:
+        parser.error("coupled congestion control needs both paths in one process (--workers inline)")
+    if args.workers == "process" and args.pacing:
+        parser.error("--pacing paces the connections in this process (--workers inline)")
+    if args.chunk_size < CHUNK_HEADER.size:
+        parser.error(f"--chunk-size must be at least {CHUNK_HEADER.size} (the chunk header)")
+    if args.abr and args.delivery != DELIVERY_STREAM:
+        parser.error("--abr needs --delivery stream: segment throughput comes from stream ACKs, "
+                     "and datagrams are never ACKed per chunk")
+    if args.delivery != DELIVERY_STREAM and args.chunk_size > MAX_DATAGRAM_CHUNK:
+        parser.error(f"--chunk-size must be at most {MAX_DATAGRAM_CHUNK} to fit a chunk in one datagram")
+
+    if args.direction == DIRECTION_DOWNLOAD and (
+            args.workers != "inline" or args.cc != "reno" or args.metrics_port or args.metrics_file
+            or args.phase_timers or args.loop_lag or args.profile):
+        parser.error("--direction download only takes the run options (scheduler, chunks, "
+                     "delivery, pacing): the server sends, with its own controller and metrics")
+
+    streams = None
+    if args.streams:
+        if args.direction == DIRECTION_DOWNLOAD or args.abr or args.pacing:
+            parser.error("--streams runs uploads without --abr or --pacing")
+        if args.workers != "inline" or args.delivery != DELIVERY_STREAM:
+            parser.error("--streams needs --workers inline and --delivery stream (one QUIC "
+                         "stream per logical stream and path)")
+        try:
+            streams = parse_streams(args.streams)
+        except ValueError as e:
+            parser.error(str(e))
 
-    scheduler = sys.argv[1]
     SEQ = 0
     LOG = []
-    asyncio.run(main(scheduler))
+    VERBOSE = args.verbose
+    if args.direction == DIRECTION_DOWNLOAD:
+        completed = asyncio.run(download(args.sched, args.local_a, args.server_a, args.local_b,
+                                         args.server_b, args.chunks, args.chunk_size, args.delivery,
+                                         args.pacing, args.pacing_burst, args.abr, args.segments))
+    else:
+        completed = asyncio.run(main(args.sched, args.local_a, args.server_a, args.local_b,
+                                     args.server_b, args.metrics_port, args.metrics_file,
+                                     args.metrics_interval, args.cc, args.chunks, args.chunk_size,
+                                     phase_timers=args.phase_timers, loop_lag=args.loop_lag,
+                                     profile=args.profile, profile_interval=args.profile_interval,
+                                     workers=args.workers, delivery=args.delivery,
+                                     pacing=args.pacing, pacing_burst=args.pacing_burst,
+                                     abr=args.abr, segments=args.segments,
+                                     streams=streams, duration=args.duration))
+    if LOOP_ERRORS:
+        print(f"*** {len(LOOP_ERRORS)} error(s) in event loop callbacks, first: {LOOP_ERRORS[0]!r}")
+        sys.exit(1)
+    if not completed:
+        sys.exit(1)
@@ -1,21 +1,304 @@
 #!/usr/bin/env python3
+import argparse
 import asyncio
 import json
+import multiprocessing
 import os
+import signal
 import time
 
+from aioquic import tls
 from aioquic.quic.configuration import QuicConfiguration
 from aioquic.asyncio import serve
 from aioquic.asyncio.protocol import QuicConnectionProtocol
 from aioquic.quic.events import (
     QuicEvent,
+    DatagramFrameReceived,
     StreamDataReceived,
     ProtocolNegotiated,
     HandshakeCompleted,
 )
 
+import scheduler_client
+from abr import AbrSession
+from framing import (
+    CHUNK_HEADER, MAX_DATAGRAM_FRAME_SIZE, ChunkReader, make_header, make_refusal, parse_datagram,
+)
+from metrics import Registry, serve_http, write_snapshot, write_snapshots
+from pacing import install as install_pacer
+from profiling import (
+    PROFILERS, SAMPLE_INTERVAL, LoopLagMonitor, PhaseTimer, Profiler, print_summary, write_summary,
+)
+from server_workers import log_suffix, merge_worker_logs, serve_worker
+
 LOG = []
 CURRENT_SCHED = "unknown"
+CURRENT_RUN = None
+VERBOSE = False
+WORKER = None  # index of this worker process with --workers N, else None
+WORKER_GRACE = 0.5  # seconds for workers to stop on their own before we signal them
+
+# Receive state for the current run, shared by all of its path connections
+SEEN = set()
+HIGHEST_SEQ = -1
+
+# Download runs (scheduler_client.py --direction download) by run id, from the
+# first path's request until the scheduler has sent every chunk. The
+# scheduler's state is module-global, so one download is served at a time.
+SESSIONS = {}
+
+METRICS = Registry()
+CHUNKS_RECEIVED = METRICS.counter(
+    "mpquic_server_chunks_received_total", "Chunks received", ["path"])
+BYTES_RECEIVED = METRICS.counter(
+    "mpquic_server_bytes_received_total", "Chunk bytes received", ["path"])
+DUPLICATES = METRICS.counter(
+    "mpquic_server_duplicates_total", "Chunks whose sequence number was already received", ["path"])
+REORDER_DEPTH = METRICS.histogram(
+    "mpquic_server_reorder_depth", "Sequence numbers behind the highest seen when a chunk arrived",
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128, 256))
+LATENCY = METRICS.histogram(
+    "mpquic_server_latency_seconds", "One-way chunk latency from first send", ["path"])
+DATAGRAMS_RECEIVED = METRICS.counter(
+    "mpquic_server_datagrams_received_total", "Chunks received as DATAGRAM frames", ["path"])
+DATAGRAM_LATENCY = METRICS.histogram(
+    "mpquic_server_datagram_latency_seconds", "One-way latency of chunks received as datagrams",
+    ["path"])
+STREAM_LATENCY = METRICS.histogram(
+    "mpquic_server_stream_latency_seconds", "One-way chunk latency from generation, per logical stream",
+    ["stream"])
+
+# Hot-path profiling (see profiling.py), off unless enabled on the command line
+PHASES = PhaseTimer(METRICS, "mpquic_server_phase_seconds", "Time per receive-path phase")
+LOOP_LAG = LoopLagMonitor(METRICS, "mpquic_server_loop_lag_seconds",
+                          "How late the event loop wakes a periodic sleeper")
+
+
+def save_log():
+    """Write the current run's log to runs/<sched>/server_log.json."""
+    if not LOG:
+        return
+    sched = CURRENT_SCHED or "unknown"
+    log_dir = os.path.join("runs", sched)
+    os.makedirs(log_dir, exist_ok=True)
+
+    out_path = os.path.join(log_dir, f"server_log{log_suffix(WORKER)}.json")
+    with open(out_path, "w") as f:
+        json.dump(LOG, f, indent=2)
+
+    print(f"*** Wrote {out_path}")
+    if WORKER is None:
+        # with --workers, stats need every worker's log (see run_workers)
+        write_datagram_stats(log_dir, LOG)
+        write_stream_stats(log_dir, LOG)
+
+
+def datagram_stats(log):
+    """
+    Loss and latency of the chunks a run sent as datagrams.
+
+    Stream chunks always arrive, so every sequence number below the highest
+    one received that never arrived was a lost datagram (datagrams lost after
+    the last chunk received are not counted).
+    """
+    datagrams = [e for e in log if e.get("delivery") == "datagram" and not e["duplicate"]]
+    received = {e["seq"] for e in log}
+    lost = [seq for seq in range(max(received) + 1) if seq not in received] if received else []
+    latencies = sorted(e["latency"] for e in datagrams)
+    sent = len(datagrams) + len(lost)
+    return {
+        "received": len(datagrams),
+        "lost": len(lost),
+        "loss_rate": len(lost) / sent if sent else 0.0,
+        "latency_p50": latencies[len(latencies) // 2] if latencies else None,
+        "latency_p95": latencies[int(len(latencies) * 0.95)] if latencies else None,
+        "latency_max": latencies[-1] if latencies else None,
+        "lost_seqs": lost,
+    }
+
+
+def write_datagram_stats(log_dir, log):
+    """Write runs/<sched>/datagram_stats.json if the run sent any datagrams."""
+    if not any(e.get("delivery") == "datagram" for e in log):
+        return
+    stats = datagram_stats(log)
+    out_path = os.path.join(log_dir, "datagram_stats.json")
+    with open(out_path, "w") as f:
+        json.dump(stats, f, indent=2)
+    print(f"*** Datagrams: {stats['received']} received, {stats['lost']} lost "
+          f"({stats['loss_rate']:.1%}), latency p50={stats['latency_p50'] * 1000:.1f}ms "
+          f"p95={stats['latency_p95'] * 1000:.1f}ms; wrote {out_path}")
+
+
+def stream_stats(log):
+    """Chunk count and one-way latency percentiles per logical stream (--streams)."""
+    latencies = {}
+    for e in log:
+        if e.get("stream") and not e["duplicate"]:
+            latencies.setdefault(e["stream"], []).append(e["latency"])
+
+    stats = {}
+    for name, values in latencies.items():
+        values.sort()
+        stats[name] = {
+            "chunks": len(values),
+            "latency_p50": values[len(values) // 2],
+            "latency_p95": values[int(len(values) * 0.95)],
+            "latency_p99": values[int(len(values) * 0.99)],
+            "latency_max": values[-1],
+        }
+    return stats
+
+
+def write_stream_stats(log_dir, log):
+    """Write runs/<sched>/stream_stats.json if the run sent logical streams."""
+    stats = stream_stats(log)
+    if not stats:
+        return
+    out_path = os.path.join(log_dir, "stream_stats.json")
+    with open(out_path, "w") as f:
+        json.dump(stats, f, indent=2)
+    for name, st in stats.items():
+        print(f"*** Stream {name:8s} {st['chunks']:6d} chunks, latency "
+              f"p50={st['latency_p50'] * 1000:.1f}ms p95={st['latency_p95'] * 1000:.1f}ms "
+              f"p99={st['latency_p99'] * 1000:.1f}ms max={st['latency_max'] * 1000:.1f}ms")
+    print(f"*** Wrote {out_path}")
+
+
+def start_run(sched, run_id):
+    """A header from a new run: flush the previous run and reset receive state."""
+    global CURRENT_SCHED, CURRENT_RUN, LOG, HIGHEST_SEQ
+
+    if run_id == CURRENT_RUN:
+        return
+    save_log()
+    CURRENT_SCHED = sched
+    CURRENT_RUN = run_id
+    LOG = []
+    SEEN.clear()
+    HIGHEST_SEQ = -1
+
+
+def record_chunk(path_name, sid, seq, size, sent, delivery="stream", now=None, stream=None):
+    global HIGHEST_SEQ
+
+    now = now or time.time()
+    duplicate = seq in SEEN
+    latency = now - sent
+
+    CHUNKS_RECEIVED.labels(path=path_name).inc()
+    BYTES_RECEIVED.labels(path=path_name).inc(size)
+    LATENCY.labels(path=path_name).observe(latency)
+    if delivery == "datagram":
+        DATAGRAMS_RECEIVED.labels(path=path_name).inc()
+        DATAGRAM_LATENCY.labels(path=path_name).observe(latency)
+    if stream is not None:
+        STREAM_LATENCY.labels(stream=stream).observe(latency)
+
+    if duplicate:
+        DUPLICATES.labels(path=path_name).inc()
+    else:
+        SEEN.add(seq)
+        REORDER_DEPTH.labels().observe(max(0, HIGHEST_SEQ - seq))
+        HIGHEST_SEQ = max(HIGHEST_SEQ, seq)
+
+    LOG.append({
+        "timestamp": now,
+        "stream_id": sid,
+        "size": size,
+        "seq": seq,
+        "path": path_name,
+        "stream": stream,
+        "delivery": delivery,
+        "latency": latency,
+        "duplicate": duplicate,
+    })
+
+
+class DownloadSession:
+    """
+    One download run: pairs the GET requests of the run's two path
+    connections, then runs the requested scheduler over them with the
+    server's own RTT, congestion and delivery-rate state, as the client
+    does for uploads.
+    """
+
+    def __init__(self, request):
+        (self.sched, self.run_id, _, self.chunks, self.chunk_size,
+         self.delivery, self.pacing_burst, self.abr, self.segments) = request
+        self.paths = {}  # path name -> (protocol, stream id)
+
+    def add_path(self, name, protocol, stream_id):
+        self.paths[name] = (protocol, stream_id)
+        if len(self.paths) == 2:
+            asyncio.ensure_future(self.run())
+
+    async def run(self):
+        scheduler_client.reset_run()
+        states = []
+        for name in sorted(self.paths):
+            protocol, sid = self.paths[name]
+            state = scheduler_client.PathState(name, protocol, sid)
+            protocol.path_state = state
+            if self.pacing_burst:
+                state.pacer = install_pacer(protocol._quic, self.pacing_burst)
+
+            header = make_header(self.sched, self.run_id, name)
+            protocol._quic.send_stream_data(sid, header, end_stream=False)
+            protocol.transmit()
+            state.wrote(0, len(header))
+            states.append(state)
+
+        content = f"{self.segments} segments ({self.abr} ABR)" if self.abr else f"{self.chunks} chunks"
+        print(f"*** Download run {self.run_id}: sending {content} with {self.sched} "
+              f"(delivery: {self.delivery})")
+        abr = AbrSession(self.abr, self.segments, self.chunk_size) if self.abr else None
+        await scheduler_client.send_chunks(self.sched, *states, 0 if abr else self.chunks,
+                                           self.chunk_size, self.delivery,
+                                           pacing=bool(self.pacing_burst), abr=abr)
+
+        for state in states:
+            state.conn._quic.send_stream_data(state.stream, b"", end_stream=True)
+            state.conn.transmit()
+            state.conn.path_state = None
+        SESSIONS.pop(self.run_id, None)
+        save_download_log(self.sched, abr)
+
+
+def save_download_log(sched, abr=None):
+    """Write the scheduler's log of a download (and an ABR run's segments) to runs/download/<sched>/."""
+    log_dir = os.path.join("runs", "download", sched)
+    os.makedirs(log_dir, exist_ok=True)
+    if abr is not None:
+        scheduler_client.write_segments(log_dir, abr)
+
+    out_path = os.path.join(log_dir, "send_log.json")
+    with open(out_path, "w") as f:
+        json.dump(scheduler_client.LOG, f, indent=2)
+    with open(os.path.join(log_dir, "path_events.json"), "w") as f:
+        json.dump(scheduler_client.PATH_EVENTS, f, indent=2)
+    print(f"*** Wrote {out_path}")
+
+
+def request_download(request, protocol, stream_id):
+    """A path's GET request: add it to its run's session, starting one if needed."""
+    run_id, path_name, chunk_size = request[1], request[2], request[4]
+    reason = None
+    if WORKER is not None:
+        # a connection stays on the worker its first packet reached, so the
+        # run's two paths may be on different processes: refuse right away
+        reason = "downloads need server.py without --workers"
+    elif chunk_size < CHUNK_HEADER.size:
+        reason = f"chunk size {chunk_size} is below the {CHUNK_HEADER.size}-byte chunk header"
+    if reason is not None:
+        print(f"*** Download run {run_id}: refused, {reason}")
+        protocol._quic.send_stream_data(stream_id, make_refusal(reason), end_stream=True)
+        protocol.transmit()
+        return
+    session = SESSIONS.get(run_id)
+    if session is None:
+        session = SESSIONS[run_id] = DownloadSession(request)
+    session.add_path(path_name, protocol, stream_id)
 
 
 class MPQuicProtocol(QuicConnectionProtocol):
@@ -23,19 +306,39 @@ class MPQuicProtocol(QuicConnectionProtocol):
     Server-side QUIC protocol:
     - Logs RTT-related fields after handshake
     - Detects scheduler header (SCHED:xxx)
-    - Logs incoming data sizes
+    - Logs every incoming chunk (seq, latency, duplicate), from the stream
+      or from DATAGRAM frames, and its logical stream with --streams
     - Echoes data back to client (so client receives ACKS)
+    - Serves download requests (GET:xxx), with a scheduler PathState
+      attached while it sends
     """
 
     def __init__(self, *args, **kwargs):
+        self.path_state = None
         self._printed_loss_attrs = False
+        self._readers = {}
+        self._header = None       # (sched, run_id, path) from this connection's stream
+        self._early_datagrams = []  # datagrams that overtook the stream header
         super().__init__(*args, **kwargs)
 
-    def quic_event_received(self, event: QuicEvent) -> None:
-        global CURRENT_SCHED, LOG
+    def datagram_received(self, data, addr) -> None:
+        t = PHASES.start()
+        super().datagram_received(data, addr)
+        if self.path_state is not None:
+            # same hooks as the client's protocol: ACKs feed the scheduler
+            self.path_state.sample_rtt(self._quic._spaces[tls.Epoch.ONE_RTT].largest_acked_packet,
+                                       self._quic._loss._rtt_latest)
+            self.path_state.on_datagram_received()
+        PHASES.lap("datagram_received", t)
 
-        print("GOT EVENT:", event)
-        super().quic_event_received(event)
+    def quic_event_received(self, event: QuicEvent) -> None:
+        if VERBOSE:
+            print("GOT EVENT:", event)
+        # Stream data is parsed below rather than through asyncio stream
+        # readers: on Python >= 3.11.5 the unused writer aioquic creates gets
+        # garbage-collected, and closing it sends FIN on the stream.
+        if not isinstance(event, StreamDataReceived):
+            super().quic_event_received(event)
 
         # ---- RTT diagnostics after handshake ----
         if isinstance(event, HandshakeCompleted) and not self._printed_loss_attrs:
@@ -47,68 +350,191 @@ class MPQuicProtocol(QuicConnectionProtocol):
                 if "rtt" in name.lower():
                     print("   ", name, "=", getattr(loss, name))
 
+        # ---- Handle incoming datagrams (unreliable chunks) ----
+        if isinstance(event, DatagramFrameReceived):
+            t = PHASES.start()
+            chunk = parse_datagram(event.data)
+            t = PHASES.lap("parse", t)
+            if chunk is None:
+                return
+            if self._header is None:
+                # the path is only known from the stream header
+                self._early_datagrams.append((time.time(), chunk))
+                return
+            record_chunk(self._header[2], None, *chunk, delivery="datagram")
+            PHASES.lap("record", t)
+            return
+
         # ---- Handle incoming stream data ----
         if isinstance(event, StreamDataReceived):
-            data = event.data
+            t = PHASES.start()
             sid = event.stream_id
+            reader = self._readers.get(sid)
+            if reader is None:
+                reader = self._readers[sid] = ChunkReader()
+
+            had_header = reader.header is not None
+            chunks = reader.feed(event.data)
+            t = PHASES.lap("parse", t)
 
             # Detect scheduler header
-            if data.startswith(b"SCHED:"):
-                print("*** Raw scheduler header:", data[:150], "...")
-                try:
-                    CURRENT_SCHED = data.decode(errors="ignore").split(":", 1)[1].strip()
-                except Exception:
-                    CURRENT_SCHED = "unknown"
-                print(f"*** Scheduler detected: {CURRENT_SCHED}")
-
-            else:
-                # Log payload size
-                LOG.append({
-                    "timestamp": time.time(),
-                    "stream_id": sid,
-                    "size": len(data),
-                })
+            if reader.header is None:
+                return
+            sched, run_id, path_name = reader.header
+            if reader.request is not None:
+                if not had_header:
+                    print(f"*** Download requested: {sched} (run {run_id}, path {path_name})")
+                    request_download(reader.request, self, sid)
+                return
+            if not had_header:
+                print(f"*** Scheduler detected: {sched} (run {run_id}, path {path_name})")
+                start_run(sched, run_id)
+                self._header = reader.header
+                for arrived, chunk in self._early_datagrams:
+                    record_chunk(path_name, None, *chunk, delivery="datagram", now=arrived)
+                self._early_datagrams = []
+
+            for seq, size, sent in chunks:
+                record_chunk(path_name, sid, seq, size, sent, stream=reader.stream)
+            t = PHASES.lap("record", t)
 
             # IMPORTANT: echo data back (client uses ACKs for RTT)
-            self._quic.send_stream_data(sid, b"ACK", end_stream=False)
-            self.transmit()
+            if not event.end_stream:
+                self._quic.send_stream_data(sid, b"ACK", end_stream=False)
+                t = PHASES.lap("echo", t)
+                self.transmit()
+                PHASES.lap("transmit", t)
+
 
+async def main(args, worker=None):
+    global VERBOSE, WORKER
+    VERBOSE = args.verbose
+    WORKER = worker
+    suffix = log_suffix(worker)
+    PHASES.enabled = args.phase_timers
+    if args.loop_lag:
+        asyncio.ensure_future(LOOP_LAG.run())
+    if args.profile:
+        profiler = Profiler(args.profile, args.profile_interval)
+        profiler.start()
 
-async def main():
     conf = QuicConfiguration(
         is_client=False,
         alpn_protocols=["hq-29"],
+        max_datagram_frame_size=MAX_DATAGRAM_FRAME_SIZE,  # accept DATAGRAM frames (RFC 9221)
     )
 
     conf.load_cert_chain("cert.pem", "key.pem")
 
-    print("*** Starting QUIC server on 0.0.0.0:4443")
+    if worker is None:
+        print("*** Starting QUIC server on 0.0.0.0:4443")
 
-    # 🔥 Correct: use our custom protocol
-    await serve(
-        host="0.0.0.0",
-        port=4443,
-        configuration=conf,
-        create_protocol=MPQuicProtocol,
-    )
+        # 🔥 Correct: use our custom protocol
+        await serve(
+            host="0.0.0.0",
+            port=4443,
+            configuration=conf,
+            create_protocol=MPQuicProtocol,
+        )
+    else:
+        print(f"*** Starting QUIC server worker {worker}/{args.workers} on 0.0.0.0:4443")
+        await serve_worker(
+            "0.0.0.0", 4443,
+            configuration=conf,
+            create_protocol=MPQuicProtocol,
+            worker=worker,
+            workers=args.workers,
+            key=os.getppid(),
+        )
+
+    # workers export their metrics on consecutive ports / separate files
+    metrics_file = args.metrics_file and args.metrics_file + suffix
+    if args.metrics_port:
+        await serve_http(METRICS, args.metrics_port + (worker or 0))
+    if metrics_file:
+        asyncio.ensure_future(write_snapshots(METRICS, metrics_file, args.metrics_interval))
 
     # Keep running until Ctrl+C
     try:
         await asyncio.Event().wait()
+    finally:
+        # ---- Save logs ----
+        save_log()
+        if metrics_file:
+            write_snapshot(METRICS, metrics_file)
+
+        # profiles and phase times cover the server's lifetime; they go next
+        # to the last run's log
+        log_dir = os.path.join("runs", CURRENT_SCHED or "unknown")
+        if args.profile:
+            profiler.stop(os.path.join(log_dir, f"server_profile{suffix}"))
+        if args.phase_timers or args.loop_lag:
+            phases = PHASES.summary()
+            lag = LOOP_LAG.summary() if args.loop_lag else None
+            print_summary("Server receive-path phases", phases, lag)
+            write_summary(os.path.join(log_dir, f"server_phases{suffix}.json"), phases, lag)
+        print("*** Server stopped")
+
+
+def run_worker(args, worker):
+    try:
+        asyncio.run(main(args, worker))
     except KeyboardInterrupt:
         pass
 
-    # ---- Save logs ----
-    sched = CURRENT_SCHED or "unknown"
-    log_dir = os.path.join("runs", sched)
-    os.makedirs(log_dir, exist_ok=True)
 
-    out_path = os.path.join(log_dir, "server_log.json")
-    with open(out_path, "w") as f:
-        json.dump(LOG, f, indent=2)
+def run_workers(args):
+    """
+    Fork args.workers server processes sharing the port; on Ctrl+C (or SIGINT
+    to this process) stop them and merge their logs.
+    """
+    # fork before any event loop exists; workers find each other by our pid
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=run_worker, args=(args, i), name=f"server-{i}")
+               for i in range(args.workers)]
+    for w in workers:
+        w.start()
 
-    print(f"*** Server stopped, wrote {out_path}")
+    try:
+        for w in workers:
+            w.join()
+    except KeyboardInterrupt:
+        # a terminal Ctrl+C reaches the workers too; otherwise pass it on
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        time.sleep(WORKER_GRACE)
+        for w in workers:
+            if w.is_alive():
+                os.kill(w.pid, signal.SIGINT)
+        for w in workers:
+            w.join()
+
+    for log_dir, log in merge_worker_logs().items():
+        write_datagram_stats(log_dir, log)
+        write_stream_stats(log_dir, log)
+    print("*** Server stopped")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verbose", action="store_true", help="print every QUIC event")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="server processes sharing the UDP port (SO_REUSEPORT)")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on this port")
+    parser.add_argument("--metrics-file", help="append JSON metric snapshots to this file")
+    parser.add_argument("--metrics-interval", type=float, default=1.0)
+    parser.add_argument("--phase-timers", action="store_true",
+                        help="time each receive-path phase; summary in runs/<sched>/server_phases.json")
+    parser.add_argument("--loop-lag", action="store_true", help="monitor event-loop lag")
+    parser.add_argument("--profile", choices=PROFILERS,
+                        help="profile the server; output in runs/<sched>/server_profile.*")
+    parser.add_argument("--profile-interval", type=float, default=SAMPLE_INTERVAL,
+                        help="seconds between stack samples for --profile sample")
+
+    args = parser.parse_args()
+    if args.workers > 1:
+        run_workers(args)
+    else:
+        try:
+            asyncio.run(main(args))
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,180 @@
+"""
+Multi-process mode for server.py (--workers N).
+
+N forked workers each run the normal server on their own event loop, all
+bound to the same UDP port with SO_REUSEPORT. The kernel spreads incoming
+packets over the workers by 4-tuple, which keeps a connection on one worker
+only as long as its addresses do not change. To pin every connection to the
+worker that owns its state regardless:
+
+  - a worker stamps its index into the first byte of every connection ID it
+    issues, so every packet the client sends after the handshake names its
+    owner;
+  - a worker that receives a packet for a connection ID owned by another
+    worker forwards it, with the client address, over a Unix datagram socket
+    (SteeringQuicServer); the owner processes it and replies from its own
+    socket on the same port.
+
+Each worker writes its logs with a .w<index> suffix, and merge_worker_logs()
+combines them per run when the server stops.
+"""
+import asyncio
+import glob
+import json
+import os
+import socket
+import struct
+
+from aioquic.asyncio.server import QuicServer
+
+FORWARD_HEADER = struct.Struct("!4sH")  # client IPv4 address, port; then the datagram
+SHORT_HEADER_CID_OFFSET = 1
+
+
+def steering_address(key, worker):
+    """Abstract-namespace Unix socket address of a worker's steering socket."""
+    return f"\0mpquic-server-{key}-{worker}"
+
+
+def log_suffix(worker):
+    return "" if worker is None else f".w{worker}"
+
+
+def pin_connection_ids(quic, worker):
+    """Stamp `worker` into every connection ID this server connection issues."""
+
+    def stamp():
+        for connection_id in quic._host_cids:
+            connection_id.cid = bytes([worker]) + connection_id.cid[1:]
+        quic.host_cid = quic._host_cids[0].cid
+
+    replenish = quic._replenish_connection_ids
+
+    def replenish_stamped():
+        replenish()
+        stamp()
+
+    stamp()
+    quic._local_initial_source_connection_id = quic.host_cid  # sent in transport parameters
+    quic._replenish_connection_ids = replenish_stamped
+
+
+class SteeringQuicServer(QuicServer):
+    """QuicServer that hands packets for other workers' connections to them."""
+
+    def __init__(self, *, worker, workers, key, cid_length, **kwargs):
+        super().__init__(**kwargs)
+        self.worker = worker
+        self.workers = workers
+        self.key = key
+        self.cid_length = cid_length
+        self.steer = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.steer.bind(steering_address(key, worker))
+        self.steer.setblocking(False)
+        self.forwarded = 0
+
+    def connection_made(self, transport):
+        super().connection_made(transport)
+        self._loop.add_reader(self.steer.fileno(), self._steered_received)
+
+    def owner(self, data):
+        """Worker that owns the packet's destination connection ID (None: this one)."""
+        if not data:
+            return None
+        if data[0] & 0x80:
+            # long header: flags, version(4), DCID length, DCID
+            if len(data) < 7:
+                return None
+            cid = data[6:6 + data[5]]
+        else:
+            cid = data[SHORT_HEADER_CID_OFFSET:SHORT_HEADER_CID_OFFSET + self.cid_length]
+
+        if not cid or cid in self._protocols:
+            return None
+        # new connections (client-chosen CIDs) stay with whichever worker the
+        # kernel picked unless the first byte happens to name another worker,
+        # which is still consistent for every packet carrying that CID
+        return cid[0] if cid[0] < self.workers else None
+
+    def datagram_received(self, data, addr):
+        owner = self.owner(data)
+        if owner is None or owner == self.worker:
+            super().datagram_received(data, addr)
+            return
+        header = FORWARD_HEADER.pack(socket.inet_aton(addr[0]), addr[1])
+        try:
+            self.steer.sendto(header + data, steering_address(self.key, owner))
+            self.forwarded += 1
+        except (BlockingIOError, ConnectionRefusedError, FileNotFoundError):
+            pass  # owner busy or gone: drop it like the network would
+
+    def _steered_received(self):
+        while True:
+            try:
+                message = self.steer.recv(65536)
+            except BlockingIOError:
+                return
+            ip, port = FORWARD_HEADER.unpack_from(message)
+            super().datagram_received(message[FORWARD_HEADER.size:], (socket.inet_ntoa(ip), port))
+
+    def close(self):
+        self._loop.remove_reader(self.steer.fileno())
+        self.steer.close()
+        super().close()
+
+
+async def serve_worker(host, port, *, configuration, create_protocol, worker, workers, key):
+    """Like aioquic's serve(), on a SO_REUSEPORT socket with connection-ID steering."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+
+    def create_pinned_protocol(quic, **kwargs):
+        pin_connection_ids(quic, worker)
+        return create_protocol(quic, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    _, server = await loop.create_datagram_endpoint(
+        lambda: SteeringQuicServer(
+            worker=worker, workers=workers, key=key,
+            cid_length=configuration.connection_id_length,
+            configuration=configuration, create_protocol=create_pinned_protocol,
+        ),
+        sock=sock,
+    )
+    return server
+
+
+def merge_worker_logs(runs_dir="runs"):
+    """
+    Combine every run's per-worker server logs into its server_log.json.
+
+    Entries are ordered by arrival time and the duplicate flag is recomputed
+    across workers, since paths of one run may be served by different workers.
+    Returns the merged logs by run directory.
+    """
+    logs = {}
+    for log_dir in sorted(glob.glob(os.path.join(runs_dir, "*"))):
+        parts = sorted(glob.glob(os.path.join(log_dir, "server_log.w*.json")))
+        if not parts:
+            continue
+
+        merged = []
+        for part in parts:
+            with open(part) as f:
+                merged.extend(json.load(f))
+        merged.sort(key=lambda e: e["timestamp"])
+
+        seen = set()
+        for entry in merged:
+            entry["duplicate"] = entry["seq"] in seen
+            seen.add(entry["seq"])
+
+        out_path = os.path.join(log_dir, "server_log.json")
+        with open(out_path, "w") as f:
+            json.dump(merged, f, indent=2)
+        for part in parts:
+            os.remove(part)
+        print(f"*** Merged {len(parts)} worker logs into {out_path}")
+        logs[log_dir] = merged
+    return logs
@@ -0,0 +1,122 @@
+"""
+Prioritized logical streams for scheduler_client.py (--streams).
+
+A session multiplexes several logical streams over the paths, each with its
+own QUIC stream on every path so that a loss on one stream never holds back
+another (QUIC only orders data within a stream):
+
+    name      priority  weight  chunk   source
+    control   0         1       100 B   every 100 ms
+    audio     1         1       200 B   every 20 ms   (80 kbps)
+    video     2         1       1000 B  every 5 ms    (1.6 Mbps)
+    bulk      3         1       1200 B  backlogged
+
+Lower priority numbers are more urgent. The sender always serves the most
+urgent stream with a chunk due, and streams of equal priority share by
+smooth weighted round-robin. Paced streams (control, audio, video) generate
+chunks on a clock for --duration seconds, stamped with the time they were
+generated so the receiver's latency includes time queued at the sender;
+backlogged ones (bulk) always have a chunk and fill whatever capacity is
+left (see place_chunk in scheduler_client.py).
+
+`--streams control,audio:0:2,bulk` picks streams, optionally overriding a
+stream's priority and weight as name:priority[:weight].
+"""
+from collections import deque
+
+DEFAULT_STREAMS = "control,audio,video,bulk"
+DEFAULT_DURATION = 10.0  # seconds the paced streams generate chunks for
+
+# name: (priority, weight, chunk size, seconds between chunks or None if backlogged)
+STREAM_CLASSES = {
+    "control": (0, 1, 100, 0.1),
+    "audio": (1, 1, 200, 0.02),
+    "video": (2, 1, 1000, 0.005),
+    "bulk": (3, 1, 1200, None),
+}
+
+
+class LogicalStream:
+    def __init__(self, name, priority, weight, chunk_size, interval):
+        self.name = name
+        self.priority = priority
+        self.weight = weight
+        self.chunk_size = chunk_size
+        self.interval = interval
+        self.slot = None            # PathState stream slot, the same on every path
+        self.due = deque()          # generation times of chunks waiting to be sent
+        self.next_due = None
+        self.current_weight = 0
+        self.sent = 0
+
+    @property
+    def elastic(self):
+        """Backlogged (bulk) rather than generated on a clock."""
+        return self.interval is None
+
+    def generate(self, now, end):
+        """Queue the chunks that came due by `now` (none after `end`)."""
+        if self.elastic:
+            if not self.due and now < end:
+                self.due.append(None)  # stamped when sent
+            return
+        if self.next_due is None:
+            self.next_due = now
+        while self.next_due <= now and self.next_due < end:
+            self.due.append(self.next_due)
+            self.next_due += self.interval
+
+    def take(self):
+        """Dequeue the next chunk; returns its generation time (None: now)."""
+        self.sent += 1
+        return self.due.popleft()
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "priority": self.priority,
+            "weight": self.weight,
+            "chunk_size": self.chunk_size,
+            "interval": self.interval,
+            "sent": self.sent,
+        }
+
+
+def parse_streams(spec):
+    """LogicalStreams from a --streams spec: name[:priority[:weight]],..."""
+    streams = []
+    for item in spec.split(","):
+        name, *overrides = item.split(":")
+        if name not in STREAM_CLASSES:
+            raise ValueError(f"unknown stream {name!r} (choose from {', '.join(STREAM_CLASSES)})")
+        if any(s.name == name for s in streams):
+            raise ValueError(f"stream {name!r} given twice")
+        priority, weight, chunk_size, interval = STREAM_CLASSES[name]
+        try:
+            if overrides:
+                priority = int(overrides[0])
+            if len(overrides) > 1:
+                weight = int(overrides[1])
+        except ValueError:
+            raise ValueError(f"bad stream {item!r} (name[:priority[:weight]], integers)") from None
+        streams.append(LogicalStream(name, priority, weight, chunk_size, interval))
+    return streams
+
+
+def by_priority(streams):
+    """Streams with a chunk due, most urgent first; equal priorities in weighted round-robin order."""
+    return sorted((s for s in streams if s.due), key=lambda s: (s.priority, -s.current_weight))
+
+
+def served(stream, streams):
+    """Smooth weighted round-robin among the streams due at `stream`'s priority."""
+    peers = [s for s in streams if s.due and s.priority == stream.priority]
+    for s in peers:
+        s.current_weight += s.weight
+    stream.current_weight -= sum(s.weight for s in peers)
+
+
+def next_due(streams):
+    """Earliest time a paced stream has another chunk due, or None."""
+    times = [s.next_due for s in streams if not s.elastic and s.next_due is not None]
+    return min(times) if times else None